@@ -0,0 +1,10 @@
+"""Замеры производительности API.
+
+Каждый модуль запускается из каталога backend:
+
+    python -m benchmarks.favourites_filter
+
+Скрипты создают отдельную тестовую базу, как manage.py test, и удаляют
+её по завершении, поэтому рабочие данные не затрагиваются. Базу и прочие
+настройки можно подменить через DJANGO_SETTINGS_MODULE.
+"""
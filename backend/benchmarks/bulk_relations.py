@@ -0,0 +1,114 @@
+"""Пакетные эндпоинты избранного, списка покупок и подписок.
+
+N рецептов добавляются и удаляются одиночными запросами и одним
+пакетным запросом в каждую сторону. Для подписок сравнивается только
+удаление: пакетной подписки нет.
+"""
+import time
+
+from benchmarks.utils import (
+    count_queries,
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+
+def cycle(client, single, bulk, ids, prepare=None):
+    """Возвращает число запросов и время одиночного и пакетного вариантов.
+
+    Каждый вариант возвращает данные в исходное состояние, поэтому
+    цикл можно повторять. Если задан prepare, связи создаются им
+    вне замера, а замеряется только удаление.
+    """
+
+    def singles():
+        if prepare is None:
+            for target_id in ids:
+                response = client.post(single.format(target_id))
+                assert response.status_code == 201, response.content
+        for target_id in ids:
+            response = client.delete(single.format(target_id))
+            assert response.status_code == 204, response.content
+
+    def batch():
+        responses = []
+        if prepare is None:
+            responses.append(client.post(bulk, {"ids": ids}, format="json"))
+        responses.append(client.delete(bulk, {"ids": ids}, format="json"))
+        for response in responses:
+            assert response.status_code == 200, response.content
+            assert all(
+                result["status"] in (201, 204)
+                for result in response.data["results"]
+            ), response.data
+
+    results = []
+    for function in (singles, batch):
+        if prepare is not None:
+            prepare()
+        started = time.perf_counter()
+        _, queries = count_queries(function)
+        results.append((queries, time.perf_counter() - started))
+    return results
+
+
+def main():
+    options = parser(__doc__, sizes=[20, 100], repeat=3).parse_args()
+
+    from rest_framework.test import APIClient
+
+    from users.models import Follow
+
+    with test_database():
+        user, author = create_users(2)
+        authors = create_users(max(options.sizes), prefix="author")
+        tags, ingredients = create_catalog()
+        recipes = create_recipes(
+            [author], max(options.sizes), tags[:2], ingredients[:5])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rows = []
+        for size in options.sizes:
+            recipe_ids = [recipe.id for recipe in recipes[:size]]
+            author_ids = [author.id for author in authors[:size]]
+
+            def follow():
+                Follow.objects.bulk_create(
+                    Follow(user=user, following_id=author_id)
+                    for author_id in author_ids
+                )
+
+            cases = (
+                ("favorite", "/api/recipes/{}/favorite/",
+                 "/api/recipes/favorite/", recipe_ids, None),
+                ("shopping_cart", "/api/recipes/{}/shopping_cart/",
+                 "/api/recipes/shopping_cart/", recipe_ids, None),
+                ("unsubscribe", "/api/users/{}/subscribe/",
+                 "/api/users/subscribe/", author_ids, follow),
+            )
+            for name, single, bulk, ids, prepare in cases:
+                runs = [
+                    cycle(client, single, bulk, ids, prepare)
+                    for _ in range(options.repeat)
+                ]
+                (single_queries, _), (bulk_queries, _) = runs[0]
+                single_time = min(single for (_, single), _ in runs)
+                bulk_time = min(bulk for _, (_, bulk) in runs)
+                rows.append((
+                    name, size, single_queries, f"{single_time * 1000:.0f}",
+                    bulk_queries, f"{bulk_time * 1000:.1f}",
+                ))
+        print_table(
+            ("endpoint", "ids", "single queries", "single ms",
+             "bulk queries", "bulk ms"),
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
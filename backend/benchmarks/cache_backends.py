@@ -0,0 +1,109 @@
+"""Бэкенды кеша: скорость операций и атомарность incr между процессами.
+
+Сравниваются LocMemCache, FileBasedCache и SQLiteCache на значениях
+размером с рецепт. Затем несколько процессов параллельно увеличивают
+один счётчик в общих бэкендах: итог должен совпасть с числом вызовов.
+База данных не нужна, файлы создаются во временном каталоге.
+"""
+import multiprocessing
+import os
+import tempfile
+
+from benchmarks.utils import best_of, parser, print_table
+
+PAYLOAD = {
+    "id": 1,
+    "name": "р" * 50,
+    "text": "т" * 600,
+    "ingredients": [
+        {"id": i, "name": "и" * 10, "measurement_unit": "г", "amount": i}
+        for i in range(6)
+    ],
+}
+PARAMS = {"OPTIONS": {"MAX_ENTRIES": 100000}}
+
+
+def make_backend(name, directory):
+    from django.core.cache.backends.filebased import FileBasedCache
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from foodgram_backend.cache import SQLiteCache
+
+    if name == "locmem":
+        return LocMemCache("benchmark", PARAMS)
+    if name == "filebased":
+        return FileBasedCache(os.path.join(directory, "files"), PARAMS)
+    return SQLiteCache(os.path.join(directory, "cache.sqlite3"), PARAMS)
+
+
+def rate(function, number, repeat):
+    return f"{number / best_of(function, repeat):.0f}"
+
+
+def increment(name, directory, number):
+    cache = make_backend(name, directory)
+    for _ in range(number):
+        cache.incr("counter")
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument("--number", type=int, default=2000)
+    arguments.add_argument("--processes", type=int, default=4)
+    options = arguments.parse_args()
+    number = options.number
+    keys = [f"key{i}" for i in range(number)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        rows = []
+        for name in ("locmem", "filebased", "sqlite"):
+            cache = make_backend(name, directory)
+            cache.clear()
+            cache.set("counter", 0)
+            rows.append((
+                name,
+                rate(
+                    lambda: [cache.set(key, PAYLOAD) for key in keys],
+                    number, options.repeat,
+                ),
+                rate(
+                    lambda: [cache.get(key) for key in keys],
+                    number, options.repeat,
+                ),
+                rate(
+                    lambda: [
+                        cache.get_many(keys[i:i + 20])
+                        for i in range(0, number, 20)
+                    ],
+                    number, options.repeat,
+                ),
+                rate(
+                    lambda: [cache.incr("counter") for _ in keys],
+                    number, options.repeat,
+                ),
+            ))
+        print_table(
+            ("backend", "set/s", "get/s", "get_many keys/s", "incr/s"), rows)
+        print()
+
+        rows = []
+        expected = options.processes * number
+        for name in ("filebased", "sqlite"):
+            cache = make_backend(name, directory)
+            cache.set("counter", 0)
+            processes = [
+                multiprocessing.Process(
+                    target=increment, args=(name, directory, number))
+                for _ in range(options.processes)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            result = cache.get("counter")
+            rows.append((name, expected, result, result == expected))
+        print_table(("backend", "expected", "counter", "atomic"), rows)
+
+
+if __name__ == "__main__":
+    main()
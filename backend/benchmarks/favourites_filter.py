@@ -0,0 +1,58 @@
+"""Фильтры is_favorited и is_in_shopping_cart при растущем избранном.
+
+Время ответа и число запросов не должны зависеть от того, сколько
+рецептов у пользователя в избранном.
+"""
+from benchmarks.utils import (
+    best_of,
+    count_queries,
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+
+def main():
+    options = parser(
+        __doc__, sizes=[10, 100, 1000, 10000]).parse_args()
+
+    from django.core.cache import cache
+    from rest_framework.test import APIClient
+
+    from recipes.models import Favourites
+
+    with test_database():
+        user, author = create_users(2)
+        tags, ingredients = create_catalog()
+        recipes = create_recipes(
+            [author], max(options.sizes), tags[:2], ingredients[:5])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rows = []
+        favourited = 0
+        for size in sorted(options.sizes):
+            Favourites.objects.bulk_create(
+                Favourites(user=user, recipe=recipe)
+                for recipe in recipes[favourited:size]
+            )
+            favourited = size
+            for value in ("1", "0"):
+                url = f"/api/recipes/?is_favorited={value}&limit=6"
+                cache.clear()
+                response, queries = count_queries(lambda: client.get(url))
+                assert response.status_code == 200, response.content
+                seconds = best_of(lambda: client.get(url), options.repeat)
+                rows.append((
+                    size, value, response.data["count"], queries,
+                    f"{seconds * 1000:.1f}",
+                ))
+        print_table(
+            ("favourites", "is_favorited", "count", "queries", "ms"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Автодополнение ингредиентов по ?name= на каталоге из data/.
+
+Сравнивается поиск по индексу в памяти с эквивалентным запросом
+istartswith через ORM и замеряется ответ API целиком.
+"""
+import os
+
+from benchmarks.utils import (
+    best_of,
+    count_queries,
+    parser,
+    print_table,
+    test_database,
+)
+
+PREFIXES = ("м", "мол", "абрикос", "zzz")
+
+
+def per_call(function, number, repeat):
+    """Лучшее среднее время одного вызова в микросекундах."""
+    seconds = best_of(
+        lambda: [function() for _ in range(number)], repeat)
+    return f"{seconds / number * 1e6:.1f}"
+
+
+def main():
+    arguments = parser(__doc__)
+    arguments.add_argument("--number", type=int, default=200)
+    options = arguments.parse_args()
+
+    from django.core.management import call_command
+    from rest_framework.test import APIClient
+
+    from foodgram_backend.settings import INGREDIENT_AUTOCOMPLETE_LIMIT
+    from recipes.ingredient_index import ingredient_index
+    from recipes.models import CatalogVersion, Ingredient
+
+    with test_database():
+        with open(os.devnull, "w") as devnull:
+            call_command("import_csv", stdout=devnull)
+
+        def rebuild():
+            ingredient_index.invalidate()
+            ingredient_index.all()
+
+        build = best_of(rebuild, options.repeat)
+        print(
+            f"{Ingredient.objects.count()} ingredients, "
+            f"index build {build * 1000:.1f} ms\n"
+        )
+        version = CatalogVersion.current(CatalogVersion.INGREDIENTS)
+        client = APIClient()
+
+        rows = []
+        for prefix in PREFIXES:
+            def orm():
+                return list(
+                    Ingredient.objects.filter(name__istartswith=prefix)
+                    .order_by("-name")
+                    .values("id", "name", "measurement_unit")
+                    [:INGREDIENT_AUTOCOMPLETE_LIMIT]
+                )
+
+            def api():
+                return client.get("/api/ingredients/", {"name": prefix})
+
+            response, queries = count_queries(api)
+            assert response.status_code == 200, response.content
+            rows.append((
+                prefix,
+                len(response.data),
+                per_call(
+                    lambda: ingredient_index.search(prefix, version=version),
+                    options.number, options.repeat,
+                ),
+                per_call(orm, options.number, options.repeat),
+                per_call(api, options.number, options.repeat),
+                queries,
+            ))
+        print_table(
+            ("name", "found", "index us", "orm us", "api us", "api queries"),
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Ранжированный поиск ингредиентов по ?search= на большом каталоге.
+
+Каталог из data/ размножается в --scale раз с изменёнными названиями.
+Замеряются построение индексов и запросы каждого уровня ранжирования:
+начало названия, начало слова и поиск с опечатками.
+"""
+import os
+
+from benchmarks.utils import best_of, parser, print_table, test_database
+
+QUERIES = (
+    ("мол", "prefix"),
+    ("варенье", "word"),
+    ("абрикосовое вар", "word"),
+    ("малак", "fuzzy"),
+    ("мацарела", "fuzzy"),
+    ("сыр адыгеский", "fuzzy"),
+)
+
+
+def main():
+    arguments = parser(__doc__, repeat=3)
+    arguments.add_argument("--scale", type=int, default=100)
+    arguments.add_argument("--number", type=int, default=20)
+    options = arguments.parse_args()
+
+    from django.core.management import call_command
+
+    from recipes.ingredient_index import Catalog, IngredientIndex
+    from recipes.models import Ingredient
+
+    with test_database():
+        with open(os.devnull, "w") as devnull:
+            call_command("import_csv", stdout=devnull)
+        rows = list(
+            Ingredient.objects.values("id", "name", "measurement_unit"))
+
+    ingredients = [
+        dict(
+            row,
+            id=row["id"] + copy * 10 ** 6,
+            name=row["name"] if copy == 0 else f'{row["name"]} {copy}',
+        )
+        for copy in range(options.scale)
+        for row in rows
+    ]
+    catalog = None
+
+    def build():
+        nonlocal catalog
+        catalog = Catalog(ingredients)
+
+    seconds = best_of(build, options.repeat)
+    print(
+        f"{len(ingredients)} ingredients, "
+        f"{len(catalog.words)} distinct words, "
+        f"build {seconds:.2f} s\n"
+    )
+
+    # Снимок подставляется напрямую: с заданной версией индекс
+    # не обращается к базе.
+    index = IngredientIndex()
+    index._catalog, index._version = catalog, "benchmark"
+    table = []
+    for query, tier in QUERIES:
+        found = index.ranked_search(query, version="benchmark")
+        seconds = best_of(
+            lambda: [
+                index.ranked_search(query, version="benchmark")
+                for _ in range(options.number)
+            ],
+            options.repeat,
+        )
+        table.append((
+            query, tier, f"{seconds / options.number * 1e6:.0f}",
+            found[0]["name"] if found else "-",
+        ))
+    print_table(("search", "tier", "us", "first result"), table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Рендеринг JSON и сжатие ответов.
+
+Сначала FastJSONRenderer сравнивается с JSONRenderer DRF на страницах
+рецептов разного размера. Затем для нескольких эндпоинтов замеряются
+размер ответа без сжатия и с каждой доступной кодировкой. br
+замеряется, только если установлен пакет Brotli.
+"""
+import gzip
+import os
+import random
+
+from benchmarks.utils import (
+    best_of,
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+ENDPOINTS = (
+    "/api/recipes/?limit=6",
+    "/api/recipes/?limit=100",
+    "/api/ingredients/",
+    "/api/tags/",
+    "/api/recipes/download_shopping_cart/?format=txt",
+)
+WORDS = (
+    "нарежьте", "обжарьте", "тушите", "добавьте", "смешайте", "посолите",
+    "минут", "на", "среднем", "огне", "под", "крышкой", "до", "готовности",
+    "мелко", "кубиками", "соус", "тесто", "духовке", "градусов", "и",
+)
+
+
+def recipe_text(words, seed):
+    """Случайный, но воспроизводимый текст рецепта."""
+    generator = random.Random(seed)
+    return " ".join(generator.choice(WORDS) for _ in range(words))
+
+
+def main():
+    options = parser(__doc__, sizes=[6, 100, 300], repeat=10).parse_args()
+
+    from django.core.management import call_command
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIClient, APIRequestFactory
+
+    from foodgram_backend import middleware
+    from foodgram_backend.renderers import FastJSONRenderer
+    from recipes import cart_totals
+    from recipes.models import Ingredient, Recipe, ShoppingList
+    from recipes.serializers import RecipeSerializer
+
+    decoders = {"gzip": gzip.decompress}
+    if middleware.brotli is not None:
+        decoders["br"] = middleware.brotli.decompress
+
+    with test_database():
+        user, author = create_users(2)
+        with open(os.devnull, "w") as devnull:
+            call_command("import_csv", stdout=devnull)
+        tags, _ = create_catalog(ingredients=0)
+        ingredients = list(Ingredient.objects.order_by("id")[:6])
+        recipes = create_recipes(
+            [author], max(options.sizes), tags[:1], ingredients)
+        for recipe in recipes:
+            recipe.text = recipe_text(80, recipe.id)
+        Recipe.objects.bulk_update(recipes, ["text"], batch_size=1000)
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=user, recipe=recipe) for recipe in recipes)
+        cart_totals.add_recipes(user.id, [recipe.id for recipe in recipes])
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+
+        rows = []
+        for size in options.sizes:
+            payload = {
+                "count": size,
+                "next": None,
+                "previous": None,
+                "results": RecipeSerializer(
+                    list(
+                        Recipe.objects.for_read(user)
+                        .order_by("-pub_date")[:size]
+                    ),
+                    many=True,
+                    context={"request": request},
+                ).data,
+            }
+            (drf, drf_json), (fast, fast_json) = [
+                (
+                    best_of(
+                        lambda: renderer.render(payload), options.repeat),
+                    renderer.render(payload),
+                )
+                for renderer in (JSONRenderer(), FastJSONRenderer())
+            ]
+            rows.append((
+                size, len(drf_json), f"{drf * 1000:.2f}",
+                f"{fast * 1000:.2f}", f"{drf / fast:.1f}x",
+                drf_json == fast_json,
+            ))
+        print_table(
+            ("recipes", "bytes", "drf ms", "fast ms", "speedup",
+             "identical"),
+            rows,
+        )
+        print()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        rows = []
+        for url in ENDPOINTS:
+            for encoding in ("identity", *decoders):
+                def get():
+                    response = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+                    if response.streaming:
+                        return response, b"".join(response.streaming_content)
+                    return response, response.content
+
+                response, body = get()
+                assert response.status_code == 200, body
+                used = response.get("Content-Encoding", "identity")
+                raw = decoders.get(used, bytes)(body)
+                seconds = best_of(get, options.repeat)
+                rows.append((
+                    url, encoding, used, len(raw), len(body),
+                    f"{len(body) / len(raw):.0%}", f"{seconds * 1000:.1f}",
+                ))
+        print_table(
+            ("endpoint", "accept", "encoding", "raw bytes", "sent bytes",
+             "ratio", "ms"),
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
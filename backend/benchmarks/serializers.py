@@ -0,0 +1,79 @@
+"""Скорость RecipeSerializer: план вывода против обхода полей DRF.
+
+Рецепты читаются заранее, замеряется только сериализация. Для каждого
+размера страницы проверяется, что JSON обоих вариантов совпадает
+побайтно.
+"""
+from unittest import mock
+
+from benchmarks.utils import (
+    best_of,
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+
+def stock_to_representation(self, instance):
+    from rest_framework import serializers
+
+    return serializers.Serializer.to_representation(self, instance)
+
+
+def main():
+    options = parser(__doc__, sizes=[6, 100, 1000]).parse_args()
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from recipes.models import Favourites, Recipe
+    from recipes.serializers import RecipeSerializer
+    from users.models import Follow
+    from users.representation import FastRepresentationMixin
+
+    with test_database():
+        user, author = create_users(2)
+        user.avatar = "users/avatar.png"
+        user.save()
+        Follow.objects.create(user=user, following=author)
+        tags, ingredients = create_catalog()
+        recipes = create_recipes(
+            [user, author], max(options.sizes), tags[:2], ingredients[:5])
+        Favourites.objects.create(user=user, recipe=recipes[0])
+        request = Request(APIRequestFactory().get("/api/recipes/"))
+        request.user = user
+
+        rows = []
+        for size in options.sizes:
+            page = list(
+                Recipe.objects.for_read(user).order_by("-pub_date")[:size])
+
+            def serialize():
+                return RecipeSerializer(
+                    page, many=True, context={"request": request}).data
+
+            plan = best_of(serialize, options.repeat)
+            plan_json = JSONRenderer().render(serialize())
+            with mock.patch.object(
+                FastRepresentationMixin, "to_representation",
+                stock_to_representation,
+            ):
+                stock = best_of(serialize, options.repeat)
+                stock_json = JSONRenderer().render(serialize())
+            rows.append((
+                size, f"{size / stock:.0f}", f"{size / plan:.0f}",
+                f"{stock / plan:.1f}x", stock_json == plan_json,
+            ))
+        print_table(
+            ("recipes", "drf recipes/s", "plan recipes/s", "speedup",
+             "identical"),
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Выгрузка списка покупок во всех форматах.
+
+Ингредиенты рецептов не повторяются, поэтому в выгрузке столько строк,
+сколько ингредиентов в корзине. Для каждого размера корзины
+замеряются время до первой порции ответа, полное время и пик
+выделенной памяти (tracemalloc) за весь запрос.
+"""
+import time
+import tracemalloc
+
+from benchmarks.utils import (
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+INGREDIENTS_PER_RECIPE = 5
+
+
+def download(client, file_format):
+    """Возвращает время до первой порции, полное время и размер."""
+    started = time.perf_counter()
+    response = client.get(
+        f"/api/recipes/download_shopping_cart/?format={file_format}")
+    assert response.status_code == 200, response.content
+    chunks = iter(response.streaming_content)
+    size = len(next(chunks))
+    first_chunk = time.perf_counter() - started
+    for chunk in chunks:
+        size += len(chunk)
+    return first_chunk, time.perf_counter() - started, size
+
+
+def main():
+    options = parser(
+        __doc__, sizes=[100, 1000, 5000], repeat=3).parse_args()
+    options.sizes.sort()
+
+    from rest_framework.test import APIClient
+
+    from recipes import cart_totals
+    from recipes.models import IngredientsRecipe, ShoppingList
+    from recipes.shopping_list import FORMATS
+
+    with test_database():
+        user, author = create_users(2)
+        _, ingredients = create_catalog(
+            ingredients=max(options.sizes) * INGREDIENTS_PER_RECIPE)
+        recipes = create_recipes([author], max(options.sizes))
+        IngredientsRecipe.objects.bulk_create(
+            (
+                IngredientsRecipe(
+                    recipe=recipe,
+                    ingredient=ingredients[i * INGREDIENTS_PER_RECIPE + j],
+                    amount=j + 1,
+                )
+                for i, recipe in enumerate(recipes)
+                for j in range(INGREDIENTS_PER_RECIPE)
+            ),
+            batch_size=1000,
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rows = []
+        in_cart = 0
+        for size in options.sizes:
+            added = [recipe.id for recipe in recipes[in_cart:size]]
+            ShoppingList.objects.bulk_create(
+                ShoppingList(user=user, recipe_id=recipe_id)
+                for recipe_id in added
+            )
+            cart_totals.add_recipes(user.id, added)
+            in_cart = size
+            for file_format in FORMATS:
+                first_chunk = total = float("inf")
+                for _ in range(options.repeat):
+                    first, full, length = download(client, file_format)
+                    first_chunk = min(first_chunk, first)
+                    total = min(total, full)
+                tracemalloc.start()
+                download(client, file_format)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append((
+                    size, file_format, length,
+                    f"{first_chunk * 1000:.1f}", f"{total * 1000:.1f}",
+                    f"{peak / 1024:.0f}",
+                ))
+        print_table(
+            ("recipes", "format", "bytes", "first ms", "total ms",
+             "peak KiB"),
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
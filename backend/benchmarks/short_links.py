@@ -0,0 +1,75 @@
+"""Стоимость перехода по короткой ссылке /s/<code>/.
+
+Холодный переход читает id из базы, переход после другого воркера
+берёт его из общего кеша, повторный — из LRU процесса. Для сравнения
+замеряется полный ответ ?format=json.
+"""
+import time
+
+from benchmarks.utils import (
+    count_queries,
+    create_catalog,
+    create_recipes,
+    create_users,
+    parser,
+    print_table,
+    test_database,
+)
+
+
+def main():
+    options = parser(__doc__, sizes=[1000]).parse_args()
+
+    from rest_framework.test import APIClient
+
+    from recipes.models import Recipe, encode_short_url
+    from recipes.short_links import forget_short_url, local_cache
+
+    with test_database():
+        (author,) = create_users(1)
+        tags, ingredients = create_catalog()
+        recipes = create_recipes(
+            [author], max(options.sizes), tags[:2], ingredients[:5])
+        for recipe in recipes:
+            recipe.short_url = encode_short_url(recipe.pk)
+        Recipe.objects.bulk_update(recipes, ["short_url"], batch_size=1000)
+        client = APIClient()
+
+        def forget_all():
+            for recipe in recipes:
+                forget_short_url(recipe.short_url)
+
+        def forget_local():
+            for recipe in recipes:
+                local_cache.delete(recipe.short_url)
+
+        cases = (
+            ("cold", forget_all, ""),
+            ("shared cache", forget_local, ""),
+            ("process LRU", None, ""),
+            ("?format=json", None, "?format=json"),
+        )
+        rows = []
+        for size in options.sizes:
+            codes = [recipe.short_url for recipe in recipes[:size]]
+            for label, prepare, query in cases:
+                if prepare is not None:
+                    prepare()
+                response, queries = count_queries(
+                    lambda: client.get(f"/s/{codes[0]}/{query}"))
+                assert response.status_code in (200, 302), response.content
+                best = float("inf")
+                for _ in range(options.repeat):
+                    if prepare is not None:
+                        prepare()
+                    started = time.perf_counter()
+                    for code in codes:
+                        client.get(f"/s/{code}/{query}")
+                    best = min(best, time.perf_counter() - started)
+                rows.append((
+                    label, size, queries, f"{best / size * 1e6:.0f}"))
+        print_table(("case", "links", "queries/hit", "us/hit"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import argparse
+import os
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram_backend.settings")
+django.setup()
+
+from django.db import connection, reset_queries  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from rest_framework.views import APIView  # noqa: E402
+
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }
+}
+IMAGE = "recipes/images/benchmark.gif"
+
+
+def parser(description, **defaults):
+    """Общие параметры: число повторов и размеры данных."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--repeat", type=int, default=defaults.get("repeat", 5),
+        help="Сколько раз повторить замер; берётся лучший результат.",
+    )
+    if "sizes" in defaults:
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=defaults["sizes"],
+            help="Размеры данных, на которых выполняются замеры.",
+        )
+    return parser
+
+
+@contextmanager
+def test_database(caches=BENCHMARK_CACHES):
+    """Создаёт тестовую базу на время замера и удаляет её после.
+
+    Ограничение частоты запросов отключается: замеры повторяют одни
+    и те же запросы тысячи раз.
+    """
+    setup_test_environment()
+    config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with override_settings(CACHES=caches), mock.patch.object(
+            APIView, "throttle_classes", ()
+        ):
+            from django.core.cache import cache
+
+            cache.clear()
+            yield
+    finally:
+        teardown_databases(config, verbosity=0)
+        teardown_test_environment()
+
+
+def best_of(function, repeat):
+    """Лучшее время вызова function в секундах."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def count_queries(function):
+    """Возвращает результат function и число выполненных запросов.
+
+    Журнал запросов ограничен 9000 записями и при переполнении
+    даёт неверный счёт, поэтому перед замером он очищается.
+    """
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        result = function()
+    return result, len(queries)
+
+
+def print_table(headers, rows):
+    rows = [[str(value) for value in row] for row in rows]
+    widths = [
+        max(len(str(header)), *(len(row[i]) for row in rows))
+        for i, header in enumerate(headers)
+    ]
+    for row in [headers, ["-" * width for width in widths], *rows]:
+        print("  ".join(
+            str(value).rjust(width) for value, width in zip(row, widths)
+        ))
+
+
+def create_users(count, prefix="user"):
+    from users.models import User
+
+    User.objects.bulk_create(
+        User(
+            email=f"{prefix}{i}@benchmark.ru", username=f"{prefix}{i}",
+            first_name="Имя", last_name="Фамилия",
+        )
+        for i in range(count)
+    )
+    return list(
+        User.objects.filter(username__startswith=prefix).order_by("id"))
+
+
+def create_catalog(tags=3, ingredients=50):
+    from recipes.models import Ingredient, Tag
+
+    Tag.objects.bulk_create(
+        Tag(name=f"Тег {i}", slug=f"tag{i}") for i in range(tags))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f"ингредиент {i}", measurement_unit="г")
+        for i in range(ingredients)
+    )
+    return (
+        list(Tag.objects.order_by("id")),
+        list(Ingredient.objects.order_by("id")),
+    )
+
+
+def create_recipes(authors, count, tags=(), ingredients=(), text_length=200):
+    """Создаёт рецепты пакетно и возвращает их с id.
+
+    bulk_create не везде возвращает первичные ключи, поэтому рецепты
+    перечитываются по уникальному названию.
+    """
+    from recipes.models import IngredientsRecipe, Recipe, TagsReciep
+
+    prefix = f"bench-{Recipe.objects.count()}-"
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author=authors[i % len(authors)], name=f"{prefix}{i}",
+                text="т" * text_length, cooking_time=i % 100 + 1,
+                image=IMAGE,
+            )
+            for i in range(count)
+        ),
+        batch_size=1000,
+    )
+    recipes = list(
+        Recipe.objects.filter(name__startswith=prefix).order_by("id"))
+    TagsReciep.objects.bulk_create(
+        (
+            TagsReciep(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags
+        ),
+        batch_size=1000,
+    )
+    IngredientsRecipe.objects.bulk_create(
+        (
+            IngredientsRecipe(recipe=recipe, ingredient=ingredient, amount=i)
+            for recipe in recipes
+            for i, ingredient in enumerate(ingredients, 1)
+        ),
+        batch_size=1000,
+    )
+    return recipes
@@ -0,0 +1,236 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Время последнего чтения обновляется не чаще раза в эти секунды:
+# для вытеснения давно не читанных записей точность выше не нужна,
+# а каждое обновление — это запись в базу.
+ACCESS_RESOLUTION = 10
+# Проверять переполнение после каждых n строк, записанных процессом.
+CULL_EVERY = 100
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в файле SQLite в режиме WAL, общий для всех процессов
+    на одной машине (например, воркеров gunicorn).
+
+    LOCATION — путь к файлу; каталог создаётся доступным только
+    владельцу. При превышении MAX_ENTRIES удаляются просроченные записи,
+    а затем 1/CULL_FREQUENCY давно не читанных. Подсчёт строк дорог,
+    поэтому переполнение проверяется раз в CULL_EVERY записанных строк:
+    между проверками каждый процесс может превысить MAX_ENTRIES
+    не больше чем на CULL_EVERY - 1 строк. incr и add атомарны между
+    процессами.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._written = 0
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Соединения SQLite нельзя переносить через fork().
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=30, isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    @contextmanager
+    def _write(self):
+        """Транзакция с блокировкой записи с самого начала."""
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _touch_rows(self, keys, now):
+        self._connection.executemany(
+            "UPDATE cache SET accessed = ? WHERE key = ? AND accessed < ?",
+            [(now, key, now - ACCESS_RESOLUTION) for key in keys],
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._connection.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return default
+        if row[2] < now - ACCESS_RESOLUTION:
+            self._touch_rows([key], now)
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        now = time.time()
+        rows = self._connection.execute(
+            "SELECT key, value, accessed FROM cache WHERE key IN "
+            f"({', '.join(['?'] * len(keys))}) "
+            "AND (expires IS NULL OR expires > ?)",
+            [*keys, now],
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if accessed < now - ACCESS_RESOLUTION]
+        if stale:
+            self._touch_rows(stale, now)
+        return {keys[key]: pickle.loads(value) for key, value, _ in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dumps(value), expires, now)
+            for key, value in data.items()
+        ]
+        with self._write() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+        written = self._written
+        self._written += len(rows)
+        if self._written // CULL_EVERY != written // CULL_EVERY:
+            self._cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                "INSERT INTO cache (key, value, expires, accessed) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "value = excluded.value, expires = excluded.expires, "
+                "accessed = excluded.accessed "
+                "WHERE cache.expires IS NOT NULL AND cache.expires <= ?",
+                (key, self._dumps(value), self.get_backend_timeout(timeout),
+                 now, now),
+            )
+            return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                "SELECT value FROM cache WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                "UPDATE cache SET value = ? WHERE key = ?",
+                (self._dumps(value), key),
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            return connection.execute(
+                "UPDATE cache SET expires = ? WHERE key = ? "
+                "AND (expires IS NULL OR expires > ?)",
+                (self.get_backend_timeout(timeout), key, time.time()),
+            ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self._connection.execute(
+            "SELECT 1 FROM cache WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (self._key(key, version), time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        with self._write() as connection:
+            return connection.execute(
+                "DELETE FROM cache WHERE key = ?",
+                (self._key(key, version),),
+            ).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        with self._write() as connection:
+            connection.executemany("DELETE FROM cache WHERE key = ?", keys)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute("DELETE FROM cache")
+
+    def _cull(self):
+        with self._write() as connection:
+            connection.execute(
+                "DELETE FROM cache WHERE expires <= ?", (time.time(),))
+            count = connection.execute(
+                "SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute("DELETE FROM cache")
+                return
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY accessed LIMIT ?)",
+                (max(count // self._cull_frequency,
+                     count - self._max_entries),),
+            )
+
+    def close(self, **kwargs):
+        # Соединение живёт всё время работы потока: Django закрывает кеши
+        # после каждого запроса, а открывать файл заново дорого.
+        pass
@@ -0,0 +1,108 @@
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+from foodgram_backend.settings import (
+    COMPRESSIBLE_CONTENT_TYPES,
+    COMPRESSION_MIN_SIZE,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=5)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+ENCODERS = {
+    "gzip": (compress_string, compress_sequence),
+}
+if brotli is not None:
+    ENCODERS["br"] = (
+        lambda data: brotli.compress(data, mode=brotli.MODE_TEXT, quality=5),
+        _brotli_sequence,
+    )
+# При равных весах в Accept-Encoding выбираем кодировку, сжимающую лучше.
+PREFERENCE = ("br", "gzip")
+
+
+def negotiate_encoding(accept_encoding):
+    """Выбирает кодировку из Accept-Encoding с учётом весов q."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -position, coding)
+        for position, coding in enumerate(PREFERENCE)
+        if coding in ENCODERS
+    ]
+    weight, _, coding = max(candidates)
+    return coding if weight > 0 else None
+
+
+class CompressionMiddleware:
+    """Сжимает текстовые ответы в br или gzip по заголовку
+    Accept-Encoding клиента; ответы меньше COMPRESSION_MIN_SIZE
+    отдаются как есть.
+
+    Ответы, в которые попал CSRF-токен, не сжимаются (защита от BREACH).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header("Content-Encoding") or request.META.get(
+            "CSRF_COOKIE_USED"
+        ):
+            return response
+        # Vary ставится и несжатым ответам: тот же URL может позже
+        # сжиматься, и кеш должен различать варианты по Accept-Encoding.
+        patch_vary_headers(response, ("Accept-Encoding",))
+        content_type = response.get("Content-Type", "").split(";")[0]
+        if content_type not in COMPRESSIBLE_CONTENT_TYPES:
+            return response
+        if not response.streaming and (
+            len(response.content) < COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        coding = negotiate_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+        compress, compress_stream = ENCODERS[coding]
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content)
+            del response["Content-Length"]
+        else:
+            compressed = compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(response.content))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = coding
+        return response
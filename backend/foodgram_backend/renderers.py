@@ -0,0 +1,41 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson, если он установлен.
+
+    Типы, которые orjson не пишет так же, как DRF (даты, Decimal,
+    ленивые строки), передаются кодировщику DRF, поэтому ответ
+    совпадает с ответом стандартного рендерера. Без orjson, а также
+    для запросов с отступами, работает стандартный рендерер.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(
+            accepted_media_type or "", renderer_context or {}
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=ORJSON_OPTIONS,
+            )
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        # Как и DRF, экранируем разделители строк, недопустимые в JS.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "foodgram_backend.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,6 +81,19 @@ DATABASES = {
     }
 }
 
+# Общий для всех воркеров gunicorn кеш в файле SQLite. Значения хранятся
+# в pickle, поэтому файл должен лежать там, куда может писать только
+# приложение, а не в общем каталоге вроде /tmp.
+CACHES = {
+    "default": {
+        "BACKEND": "foodgram_backend.cache.SQLiteCache",
+        "LOCATION": os.getenv(
+            "CACHE_LOCATION", str(BASE_DIR / "cache" / "cache.sqlite3")
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -145,6 +159,10 @@ REST_FRAMEWORK = {
         "user": "5000/day",
         "anon": "3000/day",
     },
+    "DEFAULT_RENDERER_CLASSES": [
+        "foodgram_backend.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "users.pagination.CustomPagination",
     "PAGE_SIZE": 6,
 }
@@ -168,4 +186,26 @@ MAXIMUM_COOKING_TIME_IN_MIN = 32000
 MINIMUM_AMOUNT = 1
 MAXIMUM_AMOUNT = 32000
 CHARACTERS_FOR_SHORT_URL = "ABCDEFGHJKLMNOPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz234567890"
-SHORT_URL_LENGTH = 3
+# Коды короче SHORT_URL_LENGTH выдавались случайно и остаются рабочими.
+SHORT_URL_LENGTH = 4
+SHORT_URL_MAX_LENGTH = 16
+SHORT_URL_MULTIPLIER = 1000003
+SHORT_LINK_CACHE_SIZE = 4096
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CHUNK_SIZE = 2000
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+BULK_RELATIONS_LIMIT = 100
+RECIPE_PAYLOAD_CACHE_TIMEOUT = 60 * 60
+COMPRESSION_MIN_SIZE = 1024
+# text/html не сжимается: страницы админки и браузерного API содержат
+# CSRF-токен, а сжатие секрета рядом с данными запроса открывает BREACH.
+COMPRESSIBLE_CONTENT_TYPES = frozenset((
+    "application/json",
+    "application/javascript",
+    "text/plain",
+    "text/csv",
+    "text/css",
+))
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
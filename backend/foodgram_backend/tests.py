@@ -0,0 +1,206 @@
+import gzip
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import time
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+from recipes.tests import TEST_CACHES
+from .cache import CULL_EVERY, SQLiteCache
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CompressionMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f"Ингредиент {i}", measurement_unit="г")
+            for i in range(100)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_json_compressed(self):
+        response = self.client.get(
+            "/api/ingredients/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = gzip.decompress(response.content).decode()
+        self.assertEqual(content.count("measurement_unit"), 100)
+
+    def test_small_response_not_compressed(self):
+        response = self.client.get(
+            "/api/ingredients/?name=Ингредиент 99",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_html_not_compressed(self):
+        for url in ("/admin/login/", "/api/ingredients/?format=api"):
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_ACCEPT_ENCODING="gzip, br")
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_csrf_token_not_compressed(self):
+        response = self.client.get(
+            "/admin/login/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertIn(b"csrfmiddlewaretoken", response.content)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+@skipUnless(
+    "fork" in multiprocessing.get_all_start_methods(), "Нужен fork()."
+)
+class SQLiteCacheTest(SimpleTestCase):
+    max_entries = 50
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "cache", "cache.sqlite3")
+        self.cache = self.make_cache()
+        self.now = time.time()
+
+    def make_cache(self):
+        return SQLiteCache(
+            self.path,
+            {
+                "OPTIONS": {
+                    "MAX_ENTRIES": self.max_entries,
+                    "CULL_FREQUENCY": 2,
+                }
+            },
+        )
+
+    def at(self, seconds):
+        """Время через seconds секунд после начала теста."""
+        return mock.patch("time.time", return_value=self.now + seconds)
+
+    def rows(self):
+        return self.cache._connection.execute(
+            "SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def parallel(self, function, workers=4):
+        """Выполняет function(cache) в отдельных процессах, как воркеры
+        gunicorn, и возвращает результаты."""
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+
+        def run():
+            results.put(function(self.make_cache()))
+
+        processes = [context.Process(target=run) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        values = [results.get(timeout=60) for _ in processes]
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        return values
+
+    def test_directory_is_private(self):
+        self.cache.set("key", 1)
+        mode = stat.S_IMODE(os.stat(os.path.dirname(self.path)).st_mode)
+        self.assertEqual(mode & 0o077, 0)
+
+    def test_incr_is_atomic(self):
+        self.cache.set("counter", 0)
+        self.parallel(
+            lambda cache: [cache.incr("counter") for _ in range(200)])
+        self.assertEqual(self.cache.get("counter"), 4 * 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_add_is_atomic(self):
+        results = self.parallel(lambda cache: cache.add("lock", 1))
+        self.assertEqual(results.count(True), 1)
+
+    def test_add_replaces_expired(self):
+        with self.at(0):
+            self.assertTrue(self.cache.add("key", 1, timeout=10))
+            self.assertFalse(self.cache.add("key", 2, timeout=10))
+        with self.at(11):
+            self.assertTrue(self.cache.add("key", 3))
+            self.assertEqual(self.cache.get("key"), 3)
+
+    def test_expiry(self):
+        with self.at(0):
+            self.cache.set("key", "value", timeout=10)
+            self.cache.set("forever", "value", timeout=None)
+            self.cache.set("now", "value", timeout=0)
+            self.assertEqual(self.cache.get("key"), "value")
+            self.assertIsNone(self.cache.get("now"))
+        with self.at(11):
+            self.assertIsNone(self.cache.get("key"))
+            self.assertEqual(self.cache.get("key", "default"), "default")
+            self.assertFalse(self.cache.has_key("key"))
+            self.assertEqual(self.cache.get_many(["key", "forever"]),
+                             {"forever": "value"})
+            with self.assertRaises(ValueError):
+                self.cache.incr("key")
+
+    def test_touch(self):
+        with self.at(0):
+            self.cache.set("key", "value", timeout=10)
+            self.assertTrue(self.cache.touch("key", 100))
+            self.assertFalse(self.cache.touch("missing"))
+        with self.at(50):
+            self.assertEqual(self.cache.get("key"), "value")
+            self.assertTrue(self.cache.touch("key", None))
+        with self.at(10 ** 6):
+            self.assertEqual(self.cache.get("key"), "value")
+            self.cache.set("short", "value", timeout=1)
+        with self.at(10 ** 6 + 2):
+            self.assertFalse(self.cache.touch("short", 100))
+            self.assertIsNone(self.cache.get("short"))
+
+    def test_get_many_and_delete_many(self):
+        self.cache.set_many({"a": 1, "b": None, "c": [3]})
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c", "missing"]),
+            {"a": 1, "b": None, "c": [3]},
+        )
+        self.assertEqual(self.cache.get_many([]), {})
+        self.cache.delete_many(["a", "c", "missing"])
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"b": None})
+        self.assertTrue(self.cache.delete("b"))
+        self.assertFalse(self.cache.delete("b"))
+
+    def test_cull_bound(self):
+        # Между проверками запись превышает MAX_ENTRIES не больше
+        # чем на CULL_EVERY - 1 строк.
+        with self.at(0):
+            for i in range(CULL_EVERY - 1):
+                self.cache.set(f"key{i}", i)
+        self.assertEqual(self.rows(), CULL_EVERY - 1)
+        with self.at(20):
+            read = [f"key{i}" for i in range(10)]
+            self.assertEqual(len(self.cache.get_many(read)), 10)
+            self.cache.set("last", "value")
+        self.assertLessEqual(self.rows(), self.max_entries)
+        # Вытесняются давно не читанные записи.
+        with self.at(20):
+            self.assertEqual(len(self.cache.get_many(read + ["last"])), 11)
+
+    def test_cull_expired_first(self):
+        with self.at(0):
+            self.cache.set_many(
+                {f"old{i}": i for i in range(CULL_EVERY - 1)}, timeout=10)
+        with self.at(20):
+            self.cache.set("new", "value")
+            self.assertEqual(self.rows(), 1)
+            self.assertEqual(self.cache.get("new"), "value")
+
+    def test_set_many_culls_large_batch(self):
+        self.cache.set_many({f"key{i}": i for i in range(CULL_EVERY * 3)})
+        self.assertLessEqual(self.rows(), self.max_entries)
@@ -34,7 +34,7 @@ class RecipeAdmin(admin.ModelAdmin):
         description="У пользователей в избранном",
     )
     def count_favorite(self, obj):
-        return Favourites.objects.filter(recipe_id=obj.id).count()
+        return obj.favorites_count
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -0,0 +1,168 @@
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .models import IngredientsRecipe, ShoppingCartTotal, ShoppingList
+
+UPSERT_BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_id):
+    return dict(
+        IngredientsRecipe.objects.filter(recipe_id=recipe_id).values_list(
+            "ingredient_id", "amount"
+        )
+    )
+
+
+def recipes_amounts(recipe_ids):
+    """Суммарный состав нескольких рецептов: {ingredient_id: amount}."""
+    return dict(
+        IngredientsRecipe.objects.filter(recipe_id__in=recipe_ids)
+        .values("ingredient_id")
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_id", "total")
+        .order_by()
+    )
+
+
+def _column(name):
+    return ShoppingCartTotal._meta.get_field(name).column
+
+
+def _add_totals(rows):
+    """Прибавляет (user_id, ingredient_id, amount) к итогам одним
+    INSERT ... ON CONFLICT DO UPDATE на пачку строк."""
+    table = ShoppingCartTotal._meta.db_table
+    columns = ", ".join(
+        _column(name) for name in ("user", "ingredient", "total_amount")
+    )
+    amount = _column("total_amount")
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({_column('user')}, {_column('ingredient')}) "
+                f"DO UPDATE SET {amount} = {table}.{amount} "
+                f"+ excluded.{amount}",
+                [value for row in batch for value in row],
+            )
+
+
+@transaction.atomic
+def apply_deltas(user_ids, deltas):
+    """Прибавляет {ingredient_id: delta} к итогам списков покупок.
+
+    Итог не опускается ниже нуля, а обнулившиеся строки удаляются.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items()
+        if delta
+    }
+    if not deltas:
+        return
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    removed = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items()
+        if delta < 0
+    }
+    if removed:
+        totals = ShoppingCartTotal.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=removed
+        )
+        totals.update(
+            total_amount=Greatest(
+                F("total_amount") + Case(
+                    *(
+                        When(ingredient_id=ingredient_id, then=Value(delta))
+                        for ingredient_id, delta in removed.items()
+                    ),
+                    output_field=IntegerField(),
+                ),
+                Value(0),
+                output_field=IntegerField(),
+            )
+        )
+        totals.filter(total_amount=0).delete()
+
+    _add_totals([
+        (user_id, ingredient_id, delta)
+        for user_id in user_ids
+        for ingredient_id, delta in deltas.items()
+        if delta > 0
+    ])
+
+
+def add_recipe(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_deltas(
+        [user_id],
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe_amounts(recipe_id).items()
+        },
+    )
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], recipes_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas(
+        [user_id],
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipes_amounts(recipe_ids).items()
+        },
+    )
+
+
+def _cart_users(recipe_id):
+    return ShoppingList.objects.filter(recipe_id=recipe_id).values_list(
+        "user_id", flat=True
+    )
+
+
+def shift_ingredient(recipe_id, ingredient_id, delta):
+    """Переносит изменение одной строки состава в списки покупок."""
+    apply_deltas(_cart_users(recipe_id), {ingredient_id: delta})
+
+
+def update_recipe(recipe_id, old_amounts, new_amounts):
+    """Переносит в итоги разницу между старым и новым составом рецепта.
+
+    Нужна для строк, записанных bulk_create и bulk_update: они не
+    отправляют сигналов, в отличие от save() и delete() (см. signals).
+    """
+    deltas = {
+        ingredient_id: new_amounts.get(ingredient_id, 0)
+        - old_amounts.get(ingredient_id, 0)
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+    apply_deltas(_cart_users(recipe_id), deltas)
+
+
+def live_totals():
+    """Итоги, посчитанные агрегацией по текущим спискам покупок."""
+    return {
+        (row["user_id"], row["ingredient_id"]): row["total_amount"]
+        for row in IngredientsRecipe.objects.filter(
+            recipe__shoppinglist_recipe__isnull=False
+        )
+        .values(
+            "ingredient_id",
+            user_id=F("recipe__shoppinglist_recipe__user_id"),
+        )
+        .annotate(total_amount=Sum("amount"))
+        .order_by()
+    }
@@ -0,0 +1,113 @@
+from calendar import timegm
+from functools import wraps
+from hashlib import md5
+
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
+from django.utils.http import http_date
+
+from users.serializers import get_subscribed_ids
+from .models import CatalogVersion, Recipe
+
+
+def conditional(get_validators, private=False):
+    """Условный GET для метода вьюсета.
+
+    get_validators(view, request, **kwargs) возвращает части ETag
+    и дату изменения (или None) до сериализации ответа; если он вернул
+    None, запрос обрабатывается как обычно. В ETag также входят
+    полный путь запроса и выбранный формат ответа.
+    """
+    def decorator(method):
+        @wraps(method)
+        def inner(view, request, *args, **kwargs):
+            validators = get_validators(view, request, **kwargs)
+            if validators is None:
+                return method(view, request, *args, **kwargs)
+            parts, last_modified = validators
+            etag = quote_etag(
+                md5(
+                    repr(
+                        (
+                            parts,
+                            request.get_full_path(),
+                            request.accepted_media_type,
+                        )
+                    ).encode()
+                ).hexdigest()
+            )
+            if last_modified is not None:
+                last_modified = timegm(last_modified.utctimetuple())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+                patch_cache_control(response, no_cache=True)
+                if private:
+                    patch_cache_control(response, private=True)
+            return response
+
+        return inner
+
+    return decorator
+
+
+def catalog_validators(name):
+    """Версия справочника name; она же сохраняется в view.catalog_version,
+    чтобы вьюсет не читал её из базы второй раз."""
+    def get_validators(view, request, **kwargs):
+        view.catalog_version = CatalogVersion.current(name)
+        return view.catalog_version, None
+
+    return get_validators
+
+
+def recipe_validators(view, request, pk=None, **kwargs):
+    """Всё, от чего зависит ответ с рецептом: дата его изменения,
+    отметки пользователя, данные автора и версии справочников.
+
+    Last-Modified отдаётся только анонимам: отметки пользователя
+    не меняют дату изменения рецепта. Для некорректного pk возвращает
+    None, и ответ (404) формирует сам вьюсет. Версии справочников
+    сохраняются в view.catalog_versions для кеша ответов.
+    """
+    try:
+        recipes = Recipe.objects.filter(pk=pk)
+    except (TypeError, ValueError):
+        return None
+    row = (
+        recipes.with_user_flags(request.user)
+        .values_list(
+            "updated_at",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "favorites_count",
+            "in_carts_count",
+            "author_id",
+            "author__username",
+            "author__first_name",
+            "author__last_name",
+            "author__email",
+            "author__avatar",
+            "author__recipes_count",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, *values = row
+    view.catalog_versions = CatalogVersion.all_versions()
+    parts = (
+        updated_at.isoformat(),
+        values,
+        row[5] in get_subscribed_ids(request),
+        view.catalog_versions,
+    )
+    return parts, updated_at if request.user.is_anonymous else None
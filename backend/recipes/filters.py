@@ -1,6 +1,8 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from .models import Favourites, Ingredient, Recipe, ShoppingList, Tag
+from .models import Favourites, Recipe, ShoppingList, Tag
+from .search import search_recipes
 
 
 class RecipeFilter(filters.FilterSet):
@@ -17,29 +19,28 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         field_name="shoppinglist", method="get_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="get_search")
 
     class Meta:
         model = Recipe
-        fields = ["author", "tags", "is_favorited", "is_in_shopping_cart"]
+        fields = [
+            "author",
+            "tags",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+        ]
 
     def _get_resipes(self, model, queryset, value):
         if self.request.user.is_anonymous:
-            return Recipe.objects.none()
-
-        recipes = []
-        for item in model.objects.filter(user=self.request.user):
-            recipes.append(queryset.filter(id=item.recipe_id))
-
-        if not recipes:
-            qs_recipes = Recipe.objects.none()
-        elif len(recipes) == 1:
-            qs_recipes = recipes[0]
-        else:
-            qs_recipes = recipes[0].union(*recipes[1:])
+            return queryset.none()
 
+        in_user_list = Exists(
+            model.objects.filter(user=self.request.user, recipe=OuterRef("pk"))
+        )
         if value:
-            return qs_recipes
-        return Recipe.objects.all().difference(qs_recipes)
+            return queryset.filter(in_user_list)
+        return queryset.filter(~in_user_list)
 
     def get_is_favorited(self, queryset, name, value):
         return self._get_resipes(Favourites, queryset, value)
@@ -47,10 +48,5 @@ class RecipeFilter(filters.FilterSet):
     def get_is_in_shopping_cart(self, queryset, name, value):
         return self._get_resipes(ShoppingList, queryset, value)
 
-
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name="name", lookup_expr="istartswith")
-
-    class Meta:
-        model = Ingredient
-        fields = ["name"]
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
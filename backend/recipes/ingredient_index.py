@@ -0,0 +1,208 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+
+from foodgram_backend.settings import INGREDIENT_AUTOCOMPLETE_LIMIT
+from .models import CatalogVersion, Ingredient
+
+WORD = re.compile(r"\w+")
+LAST_CHARACTER = chr(0x10FFFF)
+
+
+def _bigrams(word):
+    """Биграммы слова с пробелом в начале: ' м', 'мо', 'ол', ..."""
+    word = f" {word}"
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _allowed_typos(token):
+    if len(token) < 4:
+        return 0
+    return 1 if len(token) == 4 else 2
+
+
+# Безударные гласные чаще всего путают между собой: «малако», «пицерия».
+SIMILAR_VOWELS = [set("ао"), set("еиэя"), set("её"), set("иы")]
+SIMILAR_VOWEL_COST = 0.4
+
+
+def _substitution_cost(first, second):
+    if first == second:
+        return 0
+    for group in SIMILAR_VOWELS:
+        if first in group and second in group:
+            return SIMILAR_VOWEL_COST
+    return 1
+
+
+def prefix_distance(token, word):
+    """Наименьшее расстояние Левенштейна от token до префикса word;
+    замена похожих гласных стоит SIMILAR_VOWEL_COST."""
+    previous = list(range(len(word) + 1))
+    for i, char in enumerate(token, 1):
+        current = [i]
+        for j, word_char in enumerate(word, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + _substitution_cost(char, word_char),
+            ))
+        previous = current
+    return min(previous)
+
+
+class Catalog:
+    """Неизменяемый снимок каталога и построенных по нему индексов."""
+
+    def __init__(self, ingredients):
+        self.rows = sorted(
+            ingredients, key=lambda row: (row["name"].casefold(), row["id"])
+        )
+        self.keys = [row["name"].casefold() for row in self.rows]
+
+        word_rows = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            for word in set(WORD.findall(key)):
+                word_rows[word].append(position)
+        self.words = sorted(word_rows)
+        self.word_rows = [word_rows[word] for word in self.words]
+
+        self.bigram_words = defaultdict(list)
+        for word_id, word in enumerate(self.words):
+            for bigram in _bigrams(word):
+                self.bigram_words[bigram].append(word_id)
+
+    def prefix_range(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        return start, bisect_left(
+            self.keys, prefix + LAST_CHARACTER, lo=start)
+
+    def word_prefix_rows(self, token):
+        start = bisect_left(self.words, token)
+        end = bisect_left(self.words, token + LAST_CHARACTER, lo=start)
+        rows = set()
+        for word_id in range(start, end):
+            rows.update(self.word_rows[word_id])
+        return rows
+
+    def fuzzy_words(self, token):
+        """{word_id: расстояние} для слов, чей префикс похож на token."""
+        typos = _allowed_typos(token)
+        if not typos:
+            start = bisect_left(self.words, token)
+            end = bisect_left(self.words, token + LAST_CHARACTER, lo=start)
+            return dict.fromkeys(range(start, end), 0)
+        bigrams = _bigrams(token)
+        shared = Counter()
+        for bigram in bigrams:
+            shared.update(self.bigram_words.get(bigram, ()))
+        required = max(1, len(bigrams) - 2 * typos)
+        matches = {}
+        for word_id, count in shared.items():
+            if count < required:
+                continue
+            distance = prefix_distance(token, self.words[word_id])
+            if distance <= typos:
+                matches[word_id] = distance
+        return matches
+
+
+class IngredientIndex:
+    """Каталог ингредиентов в памяти процесса.
+
+    Версия каталога хранится в базе (CatalogVersion): при её смене
+    каждый процесс перестраивает свой индекс при следующем обращении.
+    Если вызывающий код уже знает версию, он передаёт её в version,
+    и запрос к базе не нужен.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._catalog = None
+
+    def _snapshot(self, version=None):
+        if version is None:
+            version = CatalogVersion.current(CatalogVersion.INGREDIENTS)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._catalog = Catalog(
+                        Ingredient.objects.values(
+                            "id", "name", "measurement_unit")
+                    )
+                    self._version = version
+        return self._catalog
+
+    def all(self, version=None):
+        return self._snapshot(version).rows[::-1]
+
+    def search(
+        self, prefix, limit=INGREDIENT_AUTOCOMPLETE_LIMIT, version=None
+    ):
+        """Ингредиенты, название которых начинается с prefix без учёта
+        регистра, в порядке каталога (по убыванию названия)."""
+        catalog = self._snapshot(version)
+        start, end = catalog.prefix_range(prefix.casefold())
+        return catalog.rows[max(start, end - limit):end][::-1]
+
+    def ranked_search(
+        self, query, limit=INGREDIENT_AUTOCOMPLETE_LIMIT, version=None
+    ):
+        """Поиск с ранжированием: сначала совпадения с началом названия,
+        затем с началом любого слова, затем с опечатками."""
+        catalog = self._snapshot(version)
+        query = " ".join(query.casefold().split())
+        tokens = WORD.findall(query)
+        if not tokens:
+            return []
+
+        start, end = catalog.prefix_range(query)
+        found = list(range(start, min(end, start + limit)))
+        if len(found) >= limit:
+            return [catalog.rows[position] for position in found]
+        seen = set(found)
+
+        word_matches = sorted(
+            position
+            for position in catalog.word_prefix_rows(tokens[0])
+            if position not in seen
+            and f" {catalog.keys[position]}".find(f" {query}") != -1
+        )
+        found.extend(word_matches[:limit - len(found)])
+        if len(found) >= limit:
+            return [catalog.rows[position] for position in found]
+        seen.update(found)
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for word_id, distance in catalog.fuzzy_words(token).items():
+                for position in catalog.word_rows[word_id]:
+                    if token_scores.get(position, distance + 1) > distance:
+                        token_scores[position] = distance
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    position: score + token_scores[position]
+                    for position, score in scores.items()
+                    if position in token_scores
+                }
+        fuzzy_matches = sorted(
+            (score, len(catalog.keys[position]), position)
+            for position, score in scores.items()
+            if position not in seen
+        )
+        found.extend(
+            position for *_, position in fuzzy_matches[:limit - len(found)]
+        )
+        return [catalog.rows[position] for position in found]
+
+    @staticmethod
+    def invalidate():
+        CatalogVersion.bump(CatalogVersion.INGREDIENTS)
+
+
+ingredient_index = IngredientIndex()
@@ -1,33 +1,177 @@
 import csv
+import io
+import json
+import time
 from pathlib import Path
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
-TABLES = {
-    Ingredient: "ingredients.csv",
+DATA_DIR = Path(__file__).resolve().parent.parent.parent.parent / "data"
+DEFAULT_FILES = [DATA_DIR / "ingredients.csv"]
+NAME_LENGTH = Ingredient._meta.get_field("name").max_length
+UNIT_LENGTH = Ingredient._meta.get_field("measurement_unit").max_length
+
+
+def read_csv(file):
+    for row in csv.DictReader(file):
+        yield row
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Разбирает JSON-массив объектов по частям, не читая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("JSON file must contain an array.")
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if buffer[position:position + 1] == "]":
+            return
+        try:
+            row, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError("Malformed JSON file.")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield row
+
+
+READERS = {
+    ".csv": read_csv,
+    ".json": read_json,
 }
 
 
+def normalize(row):
+    """Схлопывает пробелы, приводит единицы к нижнему регистру,
+    а название — к строчной первой букве, как в остальном каталоге."""
+    name = " ".join(str(row.get("name") or "").split())
+    unit = " ".join(str(row.get("measurement_unit") or "").split()).lower()
+    if not name or not unit:
+        return None
+    name = name[0].lower() + name[1:]
+    if len(name) > NAME_LENGTH or len(unit) > UNIT_LENGTH:
+        return None
+    return name, unit
+
+
+def copy_batch(batch):
+    """Загружает пачку через COPY во временную таблицу и вставляет
+    в каталог, пропуская уже существующие пары."""
+    table = Ingredient._meta.db_table
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute("TRUNCATE ingredient_import")
+        cursor.cursor.copy_expert(
+            "COPY ingredient_import (name, measurement_unit) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+        cursor.execute(
+            f"INSERT INTO {table} (name, measurement_unit) "
+            "SELECT name, measurement_unit FROM ingredient_import "
+            "ON CONFLICT (name, measurement_unit) DO NOTHING"
+        )
+        return cursor.rowcount
+
+
+def insert_batch(batch):
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in batch
+        ),
+        ignore_conflicts=True,
+    )
+
+
 class Command(BaseCommand):
+    help = "Импортирует ингредиенты из CSV или JSON без дублирования."
 
-    def handle(self, *args, **kwargs):
-        for model, csv_file in TABLES.items():
-            path_file = (
-                f"{Path(__file__).resolve().parent.parent.parent.parent}/"
-                f"data/{csv_file}"
-            )
-            with open(path_file, mode="r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                model_objects = []
-                for row in reader:
-                    model_objects.append(model(**row))
-                model.objects.bulk_create(model_objects)
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Data imported from {csv_file} into {model.__name__}"
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="*",
+            type=Path,
+            default=DEFAULT_FILES,
+            help="Файлы .csv или .json с полями name и measurement_unit.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        use_copy = connection.vendor == "postgresql"
+        for path in options["files"]:
+            reader = READERS.get(path.suffix.lower())
+            if reader is None:
+                raise CommandError(f"Unsupported file format: {path.name}")
+            with open(path, mode="r", encoding="utf-8") as file:
+                with transaction.atomic():
+                    if use_copy:
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                "CREATE TEMP TABLE ingredient_import "
+                                f"(name varchar({NAME_LENGTH}), "
+                                f"measurement_unit varchar({UNIT_LENGTH})) "
+                                "ON COMMIT DROP"
+                            )
+                    self._import(
+                        path, reader(file), options["batch_size"], use_copy
                     )
-                )
+        ingredient_index.invalidate()
 
         self.stdout.write(self.style.SUCCESS("The import has been completed."))
+
+    def _import(self, path, rows, batch_size, use_copy):
+        started = time.monotonic()
+        count_before = None if use_copy else Ingredient.objects.count()
+        processed = skipped = inserted = 0
+        batch = set()
+
+        def flush():
+            nonlocal inserted
+            if use_copy:
+                inserted += copy_batch(sorted(batch))
+            else:
+                insert_batch(sorted(batch))
+            batch.clear()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{path.name}: {processed} rows processed "
+                f"({processed / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+
+        for row in rows:
+            processed += 1
+            pair = normalize(row)
+            if pair is None:
+                skipped += 1
+                continue
+            batch.add(pair)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        if not use_copy:
+            inserted = Ingredient.objects.count() - count_before
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Data imported from {path.name} into Ingredient: "
+                f"{inserted} new, "
+                f"{processed - inserted - skipped} already present, "
+                f"{skipped} skipped in {elapsed:.2f}s "
+                f"({processed / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+        )
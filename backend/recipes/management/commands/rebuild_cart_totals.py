@@ -0,0 +1,63 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.cart_totals import live_totals
+from recipes.models import ShoppingCartTotal
+
+
+class Command(BaseCommand):
+    help = "Пересобирает итоги списков покупок по текущим данным."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сравнить таблицу итогов с агрегатом, не изменяя.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = live_totals()
+            stored = {
+                (user_id, ingredient_id): total_amount
+                for user_id, ingredient_id, total_amount in (
+                    ShoppingCartTotal.objects.values_list(
+                        "user_id", "ingredient_id", "total_amount"
+                    )
+                )
+            }
+            mismatched = {
+                key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)
+            }
+
+            if options["check"]:
+                for user_id, ingredient_id in sorted(mismatched):
+                    self.stdout.write(
+                        f"user={user_id} ingredient={ingredient_id}: "
+                        f"stored={stored.get((user_id, ingredient_id))} "
+                        f"expected={expected.get((user_id, ingredient_id))}"
+                    )
+                if mismatched:
+                    self.stdout.write(self.style.ERROR(
+                        f"Mismatched totals: {len(mismatched)}."))
+                else:
+                    self.stdout.write(self.style.SUCCESS(
+                        "Shopping cart totals are consistent."))
+                return
+
+            ShoppingCartTotal.objects.all().delete()
+            ShoppingCartTotal.objects.bulk_create(
+                (
+                    ShoppingCartTotal(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total_amount,
+                    )
+                    for (user_id, ingredient_id), total_amount
+                    in expected.items()
+                ),
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Shopping cart totals rebuilt, fixed {len(mismatched)} rows."))
@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from recipes.payload_cache import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает попадания в кеш ответов с рецептами. "
+        "Счётчики общие для процессов только при общем бэкенде кеша."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Обнулить счётчики."
+        )
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        ratio = stats["hit_ratio"]
+        self.stdout.write(
+            f'hits: {stats["hits"]}, misses: {stats["misses"]}, '
+            f'hit ratio: {"-" if ratio is None else f"{ratio:.1%}"}'
+        )
+        if options["reset"]:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
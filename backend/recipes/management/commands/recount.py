@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favourites, Recipe, ShoppingList
+
+User = get_user_model()
+
+
+def count_rows(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favourites.objects.all(), "recipe"),
+    (Recipe, "in_carts_count", ShoppingList.objects.all(), "recipe"),
+    (User, "recipes_count", Recipe.objects.all(), "author"),
+)
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики избранного, списков покупок и рецептов."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for model, counter, queryset, field in COUNTERS:
+                actual = count_rows(queryset, field)
+                drifted = (
+                    model.objects.annotate(actual=actual)
+                    .filter(~Q(**{counter: F("actual")}))
+                    .update(**{counter: actual})
+                )
+                self.stdout.write(
+                    f"{model.__name__}.{counter}: {drifted} rows fixed")
+        self.stdout.write(self.style.SUCCESS("Counters are up to date."))
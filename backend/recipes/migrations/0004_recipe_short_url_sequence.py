@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_url',
+            field=models.CharField(db_index=True, max_length=16, null=True, unique=True, verbose_name='Короткая ссылка'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_totals(apps, schema_editor):
+    IngredientsRecipe = apps.get_model('recipes', 'IngredientsRecipe')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+    rows = (
+        IngredientsRecipe.objects.filter(
+            recipe__shoppinglist_recipe__isnull=False
+        )
+        .values(
+            'ingredient_id',
+            user_id=models.F('recipe__shoppinglist_recipe__user_id'),
+        )
+        .annotate(total_amount=models.Sum('amount'))
+        .order_by()
+    )
+    ShoppingCartTotal.objects.bulk_create(
+        (ShoppingCartTotal(**row) for row in rows), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_recipe_short_url_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Общее количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart_totals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcarttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='Unique pair user-ingredient'),
+        ),
+        migrations.RunPython(fill_totals, migrations.RunPython.noop),
+    ]
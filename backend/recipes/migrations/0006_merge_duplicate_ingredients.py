@@ -0,0 +1,67 @@
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientsRecipe = apps.get_model('recipes', 'IngredientsRecipe')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+
+    groups = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep_id=models.Min('id'), copies=models.Count('id'))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        keep_id = group['keep_id']
+        duplicate_ids = list(
+            Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit'],
+            )
+            .exclude(id=keep_id)
+            .values_list('id', flat=True)
+        )
+        for duplicate_id in duplicate_ids:
+            IngredientsRecipe.objects.filter(
+                ingredient_id=duplicate_id,
+                recipe_id__in=IngredientsRecipe.objects.filter(
+                    ingredient_id=keep_id
+                ).values('recipe_id'),
+            ).delete()
+            IngredientsRecipe.objects.filter(
+                ingredient_id=duplicate_id
+            ).update(ingredient_id=keep_id)
+
+        ShoppingCartTotal.objects.filter(
+            ingredient_id__in=[keep_id, *duplicate_ids]
+        ).delete()
+        rows = (
+            IngredientsRecipe.objects.filter(
+                ingredient_id=keep_id,
+                recipe__shoppinglist_recipe__isnull=False,
+            )
+            .values(
+                'ingredient_id',
+                user_id=models.F('recipe__shoppinglist_recipe__user_id'),
+            )
+            .annotate(total_amount=models.Sum('amount'))
+            .order_by()
+        )
+        ShoppingCartTotal.objects.bulk_create(
+            ShoppingCartTotal(**row) for row in rows
+        )
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppingcarttotal'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:33
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=models.Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_rows(apps.get_model('recipes', 'Favourites')),
+        in_carts_count=count_rows(apps.get_model('recipes', 'ShoppingList')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='У пользователей в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def delete_duplicates(model, fields):
+    """Удаляет повторы по fields, оставляя самую раннюю запись.
+
+    Возвращает затронутые пары значений fields.
+    """
+    groups = list(
+        model.objects.values(*fields)
+        .annotate(keep_id=models.Min('id'), copies=models.Count('id'))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        model.objects.filter(
+            **{field: group[field] for field in fields}
+        ).exclude(id=group['keep_id']).delete()
+    return groups
+
+
+def count_rows(model):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=models.Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def remove_duplicate_relations(apps, schema_editor):
+    Favourites = apps.get_model('recipes', 'Favourites')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    TagsReciep = apps.get_model('recipes', 'TagsReciep')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientsRecipe = apps.get_model('recipes', 'IngredientsRecipe')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+
+    delete_duplicates(TagsReciep, ['tag', 'recipe'])
+    favourites = delete_duplicates(Favourites, ['user', 'recipe'])
+    carts = delete_duplicates(ShoppingList, ['user', 'recipe'])
+
+    recipe_ids = {group['recipe'] for group in favourites + carts}
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        favorites_count=count_rows(Favourites),
+        in_carts_count=count_rows(ShoppingList),
+    )
+
+    user_ids = {group['user'] for group in carts}
+    ShoppingCartTotal.objects.filter(user_id__in=user_ids).delete()
+    rows = (
+        IngredientsRecipe.objects.filter(
+            recipe__shoppinglist_recipe__user_id__in=user_ids
+        )
+        .values(
+            'ingredient_id',
+            user_id=models.F('recipe__shoppinglist_recipe__user_id'),
+        )
+        .annotate(total_amount=models.Sum('amount'))
+        .order_by()
+    )
+    ShoppingCartTotal.objects.bulk_create(
+        (ShoppingCartTotal(**row) for row in rows), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_relations, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_remove_duplicate_relations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favourites',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='Unique favourite user-recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglist',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='Unique shopping list user-recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagsreciep',
+            constraint=models.UniqueConstraint(fields=('tag', 'recipe'), name='Unique pair tag-recipe'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+def fill_versions(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(updated_at=models.F('pub_date'))
+    CatalogVersion = apps.get_model('recipes', 'CatalogVersion')
+    CatalogVersion.objects.bulk_create(
+        [CatalogVersion(name='tags'), CatalogVersion(name='ingredients')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_relation_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Справочник')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:26
+
+from django.db import migrations
+import recipes.models
+
+
+def drop_raw_index(apps, schema_editor):
+    # 0008 создала индекс вручную, теперь он объявлен в модели.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+def create_raw_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_updated_at_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_raw_index, create_raw_index),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=recipes.models.SearchVectorIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+    ]
@@ -1,8 +1,9 @@
-import random
-
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F, Exists, OuterRef, Prefetch, Value
 
 from foodgram_backend.settings import (
     CHARACTERS_FOR_SHORT_URL,
@@ -11,9 +12,12 @@ from foodgram_backend.settings import (
     MINIMUM_AMOUNT,
     MAXIMUM_AMOUNT,
     SHORT_URL_LENGTH,
+    SHORT_URL_MAX_LENGTH,
+    SHORT_URL_MULTIPLIER,
 )
 
 User = get_user_model()
+SEARCH_CONFIG = "russian"
 
 
 class Tag(models.Model):
@@ -37,11 +41,120 @@ class Ingredient(models.Model):
         verbose_name = "ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ["-name"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["name", "measurement_unit"],
+                name="Unique pair name-measurement_unit"
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+def encode_short_url(number):
+    """Взаимно однозначно переводит номер (с 1) в короткий код.
+
+    Номера раскладываются по блокам кодов одинаковой длины, начиная
+    с SHORT_URL_LENGTH; внутри блока номер перемешивается умножением
+    на SHORT_URL_MULTIPLIER, взаимно простое с размером блока.
+    """
+    base = len(CHARACTERS_FOR_SHORT_URL)
+    index = number - 1
+    length = SHORT_URL_LENGTH
+    while index >= base ** length:
+        index -= base ** length
+        length += 1
+    index = index * SHORT_URL_MULTIPLIER % base ** length
+    code = []
+    for _ in range(length):
+        index, digit = divmod(index, base)
+        code.append(CHARACTERS_FOR_SHORT_URL[digit])
+    return "".join(reversed(code))
+
+
+class RecipeQuerySet(models.QuerySet):
+    """План выборки рецептов для чтения без запросов на каждый объект."""
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            return self.annotate(
+                is_favorited=Value(False, output_field=models.BooleanField()),
+                is_in_shopping_cart=Value(
+                    False, output_field=models.BooleanField()),
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favourites.objects.filter(recipe=OuterRef("pk"), user=user)
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingList.objects.filter(recipe=OuterRef("pk"), user=user)
+            ),
+        )
+
+    def for_read(self, user, fields=None):
+        """Рецепты для вывода; fields — поля ответа, None — все поля.
+
+        Связи, которых нет в fields, не загружаются, а text
+        откладывается. search_vector не выводится и не загружается никогда.
+        """
+        def wanted(name):
+            return fields is None or name in fields
+
+        queryset = self.defer("search_vector")
+        if wanted("is_favorited") or wanted("is_in_shopping_cart"):
+            queryset = queryset.with_user_flags(user)
+        if wanted("author"):
+            queryset = queryset.select_related("author")
+        if wanted("tags"):
+            queryset = queryset.prefetch_related("tags")
+        if wanted("ingredients"):
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "ingredients_recipe",
+                    queryset=IngredientsRecipe.objects.select_related(
+                        "ingredient"),
+                )
+            )
+        if not wanted("text"):
+            queryset = queryset.defer("text")
+        return queryset
+
+    def for_payload(self, user):
+        """Только поля, из которых строится ключ кеша ответа
+        (см. payload_cache), и отметки пользователя."""
+        return self.with_user_flags(user).select_related("author").only(
+            "id",
+            "pub_date",
+            "updated_at",
+            "author",
+            "author__username",
+            "author__first_name",
+            "author__last_name",
+            "author__email",
+            "author__avatar",
+        )
+
+
+def search_vector(name, text):
+    """Вектор из значений, а не из столбцов: UPDATE видит в столбцах
+    ещё старые название и описание."""
+    return SearchVector(
+        Value(name), weight="A", config=SEARCH_CONFIG
+    ) + SearchVector(Value(text), weight="B", config=SEARCH_CONFIG)
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN-индекс на PostgreSQL. В остальных базах поиск идёт через FTS5
+    (recipes.search), и индекс создаётся обычным."""
+
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().create_sql(model, schema_editor, using, **kwargs)
+        return models.Index.create_sql(
+            self, model, schema_editor, using, **kwargs)
+
+
 class Recipe(models.Model):
     name = models.CharField("Название", max_length=256)
     text = models.TextField("Описание")
@@ -67,30 +180,71 @@ class Recipe(models.Model):
         verbose_name="Автор",
     )
     short_url = models.CharField(
-        "Короткая ссылка", max_length=3, unique=True, db_index=True
+        "Короткая ссылка",
+        max_length=SHORT_URL_MAX_LENGTH,
+        unique=True,
+        db_index=True,
+        null=True,
     )
     pub_date = models.DateTimeField(
         "Дата добавления", auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True)
+
+    search_vector = SearchVectorField(null=True, editable=False)
+    favorites_count = models.PositiveIntegerField(
+        "У пользователей в избранном", default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        "В списках покупок", default=0, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_pub_date_idx"
+            ),
+            SearchVectorIndex(
+                fields=["search_vector"], name="recipe_search_vector_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.short_url:
-            while True:
-                self.short_url = "".join(
-                    random.choices(CHARACTERS_FOR_SHORT_URL,
-                                   k=SHORT_URL_LENGTH)
-                )
-                if not Recipe.objects.filter(
-                        short_url=self.short_url).exists():
-                    break
-        super().save(*args, **kwargs)
+        """На PostgreSQL search_vector пишется тем же INSERT или UPDATE,
+        что и сам рецепт."""
+        update_fields = kwargs.get("update_fields")
+        if connection.vendor != "postgresql" or (
+            update_fields is not None
+            and not {"name", "text"} & set(update_fields)
+        ):
+            return self._save(*args, **kwargs)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_vector"}
+        self.search_vector = search_vector(self.name, self.text)
+        try:
+            return self._save(*args, **kwargs)
+        finally:
+            # В атрибуте осталось выражение: поле снова считается
+            # отложенным и при обращении читается из базы.
+            del self.search_vector
+
+    def _save(self, *args, **kwargs):
+        if self.short_url:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.short_url = encode_short_url(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_url=self.short_url)
 
 
 class TagsReciep(models.Model):
@@ -102,6 +256,11 @@ class TagsReciep(models.Model):
         verbose_name = "связь тег-рецепт"
         verbose_name_plural = "Связь тег-рецепт"
         ordering = ["-recipe"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tag", "recipe"], name="Unique pair tag-recipe"
+            )
+        ]
 
     def __str__(self):
         return f'Тег "{self.tag}" - рецепт "{self.recipe}"'
@@ -161,6 +320,12 @@ class Favourites(models.Model):
         verbose_name = "избранное"
         verbose_name_plural = "Избранное"
         ordering = ["-user"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="Unique favourite user-recipe"
+            )
+        ]
 
     def __str__(self):
         return f"{self.recipe.name} - {self.user.username}"
@@ -184,6 +349,75 @@ class ShoppingList(models.Model):
         verbose_name = "список покупок"
         verbose_name_plural = "Списки покупок"
         ordering = ["-user"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="Unique shopping list user-recipe"
+            )
+        ]
 
     def __str__(self):
         return f"{self.recipe.name} - {self.user.username}"
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+        related_name="shopping_cart_totals",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+        related_name="shopping_cart_totals",
+    )
+    total_amount = models.PositiveIntegerField("Общее количество")
+
+    class Meta:
+        verbose_name = "итог списка покупок"
+        verbose_name_plural = "Итоги списков покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="Unique pair user-ingredient"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.ingredient}: {self.total_amount}"
+
+
+class CatalogVersion(models.Model):
+    """Счётчик изменений справочника: входит в ETag его ответов."""
+
+    TAGS = "tags"
+    INGREDIENTS = "ingredients"
+
+    name = models.CharField("Справочник", max_length=32, primary_key=True)
+    version = models.PositiveBigIntegerField("Версия", default=0)
+
+    class Meta:
+        verbose_name = "версия справочника"
+        verbose_name_plural = "Версии справочников"
+
+    def __str__(self):
+        return f"{self.name}: {self.version}"
+
+    @classmethod
+    def bump(cls, name):
+        if not cls.objects.filter(name=name).update(
+            version=F("version") + 1
+        ):
+            cls.objects.get_or_create(name=name, defaults={"version": 1})
+
+    @classmethod
+    def all_versions(cls):
+        """Версии всех справочников: [(name, version), ...]."""
+        return sorted(cls.objects.values_list("name", "version"))
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list(
+            "version", flat=True).first() or 0
@@ -0,0 +1,119 @@
+from hashlib import md5
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from foodgram_backend.settings import RECIPE_PAYLOAD_CACHE_TIMEOUT
+from users.serializers import get_subscribed_ids
+from .models import CatalogVersion, Recipe
+from .serializers import RecipeSerializer
+
+KEY_PREFIX = "recipe_payload"
+# Увеличивается при изменении формата ответа с рецептом.
+PAYLOAD_SCHEMA = 1
+HITS_KEY = "recipe_payload_hits"
+MISSES_KEY = "recipe_payload_misses"
+AUTHOR_FIELDS = ("username", "first_name", "last_name", "email", "avatar")
+
+
+def _count(key, amount):
+    if not amount:
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, amount, None)
+
+
+def get_stats():
+    values = cache.get_many((HITS_KEY, MISSES_KEY))
+    hits, misses = values.get(HITS_KEY, 0), values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / total if total else None,
+    }
+
+
+def reset_stats():
+    cache.delete_many((HITS_KEY, MISSES_KEY))
+
+
+class RecipePayloads:
+    """Кеш общей для всех части ответа с рецептом.
+
+    Ключ строится из всего, от чего зависит общий ответ: даты изменения
+    рецепта, полей автора, версий справочников и адреса сайта, поэтому
+    устаревшие записи просто перестают запрашиваться. Отметки
+    пользователя (is_favorited, is_in_shopping_cart,
+    author.is_subscribed) накладываются поверх при каждом ответе.
+    Рецепты должны быть выбраны через RecipeQuerySet.for_payload().
+    Если вызывающий код уже прочитал версии справочников, он передаёт
+    их в catalog_versions, и запрос к базе не нужен.
+    """
+
+    def __init__(self, request, catalog_versions=None):
+        self.request = request
+        if catalog_versions is None:
+            catalog_versions = CatalogVersion.all_versions()
+        self.base = (
+            PAYLOAD_SCHEMA,
+            request.build_absolute_uri("/"),
+            catalog_versions,
+        )
+
+    def key(self, recipe):
+        author = recipe.author
+        version = md5(
+            repr(
+                (
+                    self.base,
+                    recipe.updated_at.isoformat(),
+                    [str(getattr(author, name)) for name in AUTHOR_FIELDS],
+                )
+            ).encode()
+        ).hexdigest()
+        return f"{KEY_PREFIX}:{recipe.id}:{version}"
+
+    def _load(self, recipe_ids):
+        recipes = Recipe.objects.for_read(AnonymousUser()).filter(
+            id__in=recipe_ids)
+        return RecipeSerializer(
+            recipes, many=True, context={"request": self.request}
+        ).data
+
+    def render(self, recipes):
+        recipes = list(recipes)
+        keys = {recipe.id: self.key(recipe) for recipe in recipes}
+        payloads = cache.get_many(keys.values())
+        missing = [
+            recipe.id for recipe in recipes if keys[recipe.id] not in payloads
+        ]
+        if missing:
+            loaded = {
+                keys[payload["id"]]: payload
+                for payload in self._load(missing)
+            }
+            cache.set_many(loaded, RECIPE_PAYLOAD_CACHE_TIMEOUT)
+            payloads.update(loaded)
+        _count(HITS_KEY, len(recipes) - len(missing))
+        _count(MISSES_KEY, len(missing))
+
+        subscribed_ids = get_subscribed_ids(self.request)
+        return [
+            self._overlay(payloads[keys[recipe.id]], recipe, subscribed_ids)
+            for recipe in recipes
+        ]
+
+    @staticmethod
+    def _overlay(payload, recipe, subscribed_ids):
+        return {
+            **payload,
+            "author": {
+                **payload["author"],
+                "is_subscribed": recipe.author_id in subscribed_ids,
+            },
+            "is_favorited": recipe.is_favorited,
+            "is_in_shopping_cart": recipe.is_in_shopping_cart,
+        }
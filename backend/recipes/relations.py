@@ -0,0 +1,140 @@
+from django.db import connection
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from .models import Favourites, Recipe, ShoppingList
+
+RECIPE_COUNTERS = {
+    Favourites: "favorites_count",
+    ShoppingList: "in_carts_count",
+}
+
+
+def shift_recipe_counters(model, recipe_ids, delta):
+    """Сдвигает счётчик связей model у рецептов на delta, не ниже нуля."""
+    field = RECIPE_COUNTERS[model]
+    recipes = Recipe.objects.filter(pk__in=recipe_ids)
+    if delta < 0:
+        recipes = recipes.filter(**{f"{field}__gte": -delta})
+    recipes.update(**{field: F(field) + delta})
+
+
+def _columns(instance):
+    fields = [
+        field for field in instance._meta.concrete_fields
+        if not field.primary_key
+    ]
+    params = [
+        field.get_db_prep_save(getattr(instance, field.attname), connection)
+        for field in fields
+    ]
+    return [field.column for field in fields], params
+
+
+def add_relation(model, **values):
+    """Добавляет связь одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает созданный объект или None, если такая связь уже есть.
+    Сигнал post_save отправляется вручную, как при обычном save().
+    """
+    instance = model(**values)
+    columns, params = _columns(instance)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {model._meta.db_table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(params))}) "
+            f"ON CONFLICT DO NOTHING RETURNING {model._meta.pk.column}",
+            params,
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    instance.pk = row[0]
+    instance._state.adding = False
+    post_save.send(
+        sender=model,
+        instance=instance,
+        created=True,
+        update_fields=None,
+        raw=False,
+        using=connection.alias,
+    )
+    return instance
+
+
+def remove_relation(model, **values):
+    """Удаляет связь одним запросом DELETE ... RETURNING.
+
+    Возвращает False, если такой связи не было.
+    Сигнал post_delete отправляется вручную, как при обычном delete().
+    """
+    instance = model(**values)
+    columns, params = _columns(instance)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} WHERE "
+            f"{' AND '.join(f'{column} = %s' for column in columns)} "
+            f"RETURNING {model._meta.pk.column}",
+            params,
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return False
+    instance.pk = row[0]
+    post_delete.send(sender=model, instance=instance, using=connection.alias)
+    return True
+
+
+def _column(model, name):
+    return model._meta.get_field(name).column
+
+
+def add_relations(model, field, target_ids, **values):
+    """Добавляет связи с target_ids одним многострочным
+    INSERT ... ON CONFLICT DO NOTHING.
+
+    Возвращает множество id, для которых связь действительно создана.
+    Как и bulk_create, сигналы не отправляет.
+    """
+    target_ids = list(target_ids)
+    if not target_ids:
+        return set()
+    columns = [_column(model, name) for name in values]
+    target = _column(model, field)
+    row = ", ".join(["%s"] * (len(values) + 1))
+    params = []
+    for target_id in target_ids:
+        params.extend(values.values())
+        params.append(target_id)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {model._meta.db_table} "
+            f"({', '.join(columns + [target])}) VALUES "
+            f"{', '.join([f'({row})'] * len(target_ids))} "
+            f"ON CONFLICT DO NOTHING RETURNING {target}",
+            params,
+        )
+        return {target_id for target_id, in cursor.fetchall()}
+
+
+def remove_relations(model, field, target_ids, **values):
+    """Удаляет связи с target_ids одним запросом DELETE ... RETURNING.
+
+    Возвращает множество id, связь с которыми была удалена.
+    Как и QuerySet.update, сигналы не отправляет.
+    """
+    target_ids = list(target_ids)
+    if not target_ids:
+        return set()
+    target = _column(model, field)
+    conditions = [f"{_column(model, name)} = %s" for name in values]
+    conditions.append(
+        f"{target} IN ({', '.join(['%s'] * len(target_ids))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} "
+            f"WHERE {' AND '.join(conditions)} RETURNING {target}",
+            [*values.values(), *target_ids],
+        )
+        return {target_id for target_id, in cursor.fetchall()}
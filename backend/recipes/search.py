@@ -0,0 +1,73 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import SEARCH_CONFIG, Recipe
+
+FTS_TABLE = "recipes_recipe_fts"
+TOKEN = re.compile(r"\w+")
+
+
+def _is_postgres():
+    return connection.vendor == "postgresql"
+
+
+def index_recipe(recipe):
+    """Обновляет FTS5-таблицу SQLite. На PostgreSQL search_vector уже
+    записан в Recipe.save()."""
+    if _is_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, name, text) "
+            "VALUES (%s, %s, %s)",
+            [recipe.pk, recipe.name, recipe.text],
+        )
+
+
+def unindex_recipe(recipe_id):
+    if _is_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """Фильтрует рецепты по полнотекстовому запросу и сортирует
+    по релевантности, затем по дате публикации."""
+    if _is_postgres():
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type="websearch")
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(search_rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-search_rank", "-pub_date")
+        )
+
+    tokens = TOKEN.findall(query)
+    if not tokens:
+        return queryset.none()
+    match = " ".join(f'"{token}"*' for token in tokens)
+    table = Recipe._meta.db_table
+    return (
+        queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                (match,),
+            )
+        )
+        .annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"AND {FTS_TABLE}.rowid = {table}.id",
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-search_rank", "-pub_date")
+    )
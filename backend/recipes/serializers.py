@@ -3,10 +3,13 @@ import os
 
 from dotenv import load_dotenv
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 
+from users.representation import FastRepresentationMixin, SparseFieldsMixin
 from users.serializers import UserSerializer
+from . import cart_totals
 from .models import (
     Favourites,
     Ingredient,
@@ -16,8 +19,10 @@ from .models import (
     Tag,
     TagsReciep,
 )
+from .relations import add_relation, remove_relations
 
 from foodgram_backend.settings import (
+    BULK_RELATIONS_LIMIT,
     MINIMUM_COOKING_TIME_IN_MIN,
     MAXIMUM_COOKING_TIME_IN_MIN,
     MINIMUM_AMOUNT,
@@ -36,7 +41,7 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ("id", "name", "slug")
@@ -48,7 +53,9 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
-class IngredredientsRecipeSerializer(serializers.ModelSerializer):
+class IngredredientsRecipeSerializer(
+    SparseFieldsMixin, serializers.ModelSerializer
+):
     id = serializers.IntegerField(source="ingredient.id", read_only=True)
     name = serializers.CharField(source="ingredient.name", read_only=True)
     measurement_unit = serializers.CharField(
@@ -63,7 +70,9 @@ class IngredredientsRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(
+    SparseFieldsMixin, FastRepresentationMixin, serializers.ModelSerializer
+):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(many=False, read_only=True)
     ingredients = IngredredientsRecipeSerializer(
@@ -90,53 +99,108 @@ class RecipeSerializer(serializers.ModelSerializer):
             "text",
             "cooking_time",
         )
+        expandable_fields = {
+            "favorites_count": serializers.IntegerField(read_only=True),
+            "in_carts_count": serializers.IntegerField(read_only=True),
+        }
 
     def get_is_favorited(self, obj) -> bool:
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         return obj.favorites_recipe.filter(
             user__id=self.context["request"].user.id
         ).exists()
 
     def get_is_in_shopping_cart(self, obj) -> bool:
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         return obj.shoppinglist_recipe.filter(
             user__id=self.context["request"].user.id
         ).exists()
 
-    def _update_or_create_ingredients(self, ingredients, recipe, method):
-        if method == "update":
-            IngredientsRecipe.objects.filter(recipe=recipe).delete()
-        ingredients_list = []
-        for ingredient in ingredients:
-            ingredients_list.append(
-                IngredientsRecipe(
-                    ingredient=get_object_or_404(
-                        Ingredient, id=ingredient.get("id")),
-                    amount=ingredient.get("amount"),
-                    recipe=recipe,
-                )
+    def _create_ingredients(self, ingredients, recipe):
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(
+                ingredient=ingredient, amount=amount, recipe=recipe
             )
-        IngredientsRecipe.objects.bulk_create(ingredients_list)
+            for ingredient, amount in ingredients
+        )
+
+    def _update_ingredients(self, ingredients, recipe):
+        """Применяет к составу рецепта только изменения.
+
+        Возвращает прежний и новый состав в виде {ingredient_id: amount}.
+        Все записи пакетные и сигналов не отправляют.
+        """
+        current = {
+            row.ingredient_id: row for row in recipe.ingredients_recipe.all()
+        }
+        old_amounts = {
+            ingredient_id: row.amount for ingredient_id, row in current.items()
+        }
+        new_amounts = {
+            ingredient.id: int(amount) for ingredient, amount in ingredients
+        }
+
+        remove_relations(
+            IngredientsRecipe,
+            "ingredient",
+            current.keys() - new_amounts.keys(),
+            recipe=recipe.id,
+        )
+
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientsRecipe.objects.bulk_update(changed, ["amount"])
+
+        self._create_ingredients(
+            [
+                (ingredient, amount)
+                for ingredient, amount in ingredients
+                if ingredient.id not in current
+            ],
+            recipe,
+        )
+        return old_amounts, new_amounts
+
+    def _update_tags(self, tags, recipe):
+        current = {tag.id for tag in recipe.tags.all()}
+        new = {tag.id for tag in tags}
+        remove_relations(TagsReciep, "tag", current - new, recipe=recipe.id)
+        TagsReciep.objects.bulk_create(
+            TagsReciep(tag=tag, recipe=recipe)
+            for tag in tags
+            if tag.id not in current
+        )
+
+    def _reload(self, recipe):
+        return Recipe.objects.for_read(self.context["request"].user).get(
+            pk=recipe.pk
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         validated_data["author"] = self.context["request"].user
 
-        tags = self.initial_data.pop("tags")
-        ingredients = self.initial_data.pop("ingredients")
+        tags = validated_data.pop("tags")
+        ingredients = validated_data.pop("ingredients")
 
         recipe = Recipe.objects.create(**validated_data)
 
-        tags_list = []
-        for tag in tags:
-            tags_list.append(
-                TagsReciep(tag=get_object_or_404(Tag, id=tag), recipe=recipe)
-            )
-        TagsReciep.objects.bulk_create(tags_list)
-
-        self._update_or_create_ingredients(
-            ingredients=ingredients, recipe=recipe, method="create"
+        TagsReciep.objects.bulk_create(
+            TagsReciep(tag=tag, recipe=recipe) for tag in tags
         )
 
-        return recipe
+        self._create_ingredients(ingredients, recipe)
 
+        return self._reload(recipe)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         if instance.author != self.context["request"].user:
             raise serializers.ValidationError(
@@ -150,20 +214,15 @@ class RecipeSerializer(serializers.ModelSerializer):
             "cooking_time", instance.cooking_time
         )
 
-        tags = self.initial_data.pop("tags")
-        update_tags_list = []
-        for tag in tags:
-            current_tag = get_object_or_404(Tag, id=tag)
-            update_tags_list.append(current_tag)
-        instance.tags.set(update_tags_list)
+        self._update_tags(validated_data["tags"], instance)
 
-        ingredients = self.initial_data.pop("ingredients")
-        self._update_or_create_ingredients(
-            ingredients=ingredients, recipe=instance, method="update"
+        old_amounts, new_amounts = self._update_ingredients(
+            validated_data["ingredients"], instance
         )
+        cart_totals.update_recipe(instance.id, old_amounts, new_amounts)
 
         instance.save()
-        return instance
+        return self._reload(instance)
 
     def validate(self, data):
         tags = self.initial_data.get("tags")
@@ -172,17 +231,15 @@ class RecipeSerializer(serializers.ModelSerializer):
                 "Поле tags является обязательным и не должно быть пустым."
             )
 
-        unique_tags = set()
-        for tag in tags:
-            if tag in unique_tags:
-                raise serializers.ValidationError(
-                    "В поле tags не должно быть повторяющихся тегов."
-                )
-            unique_tags.add(tag)
+        if len(set(tags)) != len(tags):
+            raise serializers.ValidationError(
+                "В поле tags не должно быть повторяющихся тегов."
+            )
 
-            if not Tag.objects.filter(id=tag).exists():
-                raise serializers.ValidationError(
-                    "Указанного тега не существует.")
+        found_tags = Tag.objects.in_bulk(tags)
+        if len(found_tags) != len(tags):
+            raise serializers.ValidationError(
+                "Указанного тега не существует.")
 
         ingredients = self.initial_data.get("ingredients")
         if not ingredients:
@@ -191,21 +248,25 @@ class RecipeSerializer(serializers.ModelSerializer):
                 "и не должно быть пустым."
             )
 
-        unique_ingredients_ids = set()
-        for ingredient in ingredients:
-            if ingredient["id"] in unique_ingredients_ids:
-                raise serializers.ValidationError(
-                    "В поле ingredients не должно быть "
-                    "повторяющихся ингредиентов."
-                )
-            unique_ingredients_ids.add(ingredient["id"])
+        ingredients_ids = [ingredient["id"] for ingredient in ingredients]
+        if len(set(ingredients_ids)) != len(ingredients_ids):
+            raise serializers.ValidationError(
+                "В поле ingredients не должно быть "
+                "повторяющихся ингредиентов."
+            )
 
-            if not Ingredient.objects.filter(id=ingredient.get("id")).exists():
-                raise serializers.ValidationError(
-                    "Указанного ингредиента не существует."
-                )
+        found_ingredients = Ingredient.objects.in_bulk(ingredients_ids)
+        if len(found_ingredients) != len(ingredients_ids):
+            raise serializers.ValidationError(
+                "Указанного ингредиента не существует."
+            )
 
         data.pop("ingredients_recipe")
+        data["tags"] = list(found_tags.values())
+        data["ingredients"] = [
+            (found_ingredients[int(ingredient["id"])], ingredient["amount"])
+            for ingredient in ingredients
+        ]
         return super().validate(data)
 
 
@@ -228,32 +289,27 @@ class FavoriteSerializer(serializers.ModelSerializer):
             return f'https://{os.getenv("DOMAIN")}{obj.recipe.image.url}'
         return None
 
-    def validate(self, data):
-        recipe = get_object_or_404(
-            Recipe, id=self.context["view"].kwargs.get("recipe_id")
-        )
+    already_exists = "Данный рецепт уже добавлен в избранное!"
 
-        if recipe.favorites_recipe.filter(
-            user__id=self.context["request"].user.id
-        ).exists():
+    def create(self, validated_data):
+        instance = add_relation(self.Meta.model, **validated_data)
+        if instance is None:
             raise serializers.ValidationError(
-                "Данный рецепт уже добавлен в избранное!")
-        return data
+                {api_settings.NON_FIELD_ERRORS_KEY: [self.already_exists]}
+            )
+        return instance
 
 
 class ShoppingListSerializer(FavoriteSerializer):
+    already_exists = "Данный рецепт уже добавлен в список покупок!"
+
     class Meta(FavoriteSerializer.Meta):
         model = ShoppingList
 
-    def validate(self, data):
-        recipe = get_object_or_404(
-            Recipe, id=self.context["view"].kwargs.get("recipe_id")
-        )
 
-        if recipe.shoppinglist_recipe.filter(
-            user__id=self.context["request"].user.id
-        ).exists():
-            raise serializers.ValidationError(
-                "Данный рецепт уже добавлен в список покупок!"
-            )
-        return data
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RELATIONS_LIMIT,
+    )
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+from foodgram_backend.settings import SHOPPING_LIST_PDF_FONT
+
+TITLE = "Список покупок:"
+
+
+def _line(ingredient):
+    return (
+        f'{ingredient["ingredient__name"]} - {ingredient["total_amount"]} '
+        f'({ingredient["ingredient__measurement_unit"]})'
+    )
+
+
+def render_txt(ingredients):
+    yield f"{TITLE}\n"
+    for ingredient in ingredients:
+        yield f"{_line(ingredient)}\n"
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку вместо хранения."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow([TITLE])
+    for ingredient in ingredients:
+        yield writer.writerow([_line(ingredient)])
+
+
+def render_json(ingredients):
+    yield "["
+    separator = ""
+    for ingredient in ingredients:
+        yield separator + json.dumps(
+            {
+                "name": ingredient["ingredient__name"],
+                "measurement_unit": ingredient["ingredient__measurement_unit"],
+                "amount": ingredient["total_amount"],
+            },
+            ensure_ascii=False,
+        )
+        separator = ","
+    yield "]"
+
+
+def _pdf_font():
+    """Шрифт с кириллицей из SHOPPING_LIST_PDF_FONT.
+
+    Встроенные шрифты PDF кириллицу не содержат, поэтому без него
+    выгрузка не имеет смысла и завершается ошибкой конфигурации.
+    """
+    try:
+        pdfmetrics.getFont("ShoppingList")
+    except KeyError:
+        try:
+            pdfmetrics.registerFont(
+                TTFont("ShoppingList", SHOPPING_LIST_PDF_FONT))
+        except (OSError, TTFError) as error:
+            raise ImproperlyConfigured(
+                "SHOPPING_LIST_PDF_FONT must point to a TrueType font "
+                f"with Cyrillic glyphs: {error}"
+            ) from error
+    return "ShoppingList"
+
+
+def render_pdf(ingredients, font_size=12):
+    """Шрифт проверяется сразу, до начала ответа: иначе ошибка
+    оборвала бы уже начатую выгрузку."""
+    return _render_pdf(ingredients, _pdf_font(), font_size)
+
+
+def _render_pdf(ingredients, font, font_size):
+    """Строки агрегированы по ингредиентам, поэтому документ невелик
+    и собирается целиком: reportlab пишет файл только в save()."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    height = A4[1]
+    margin = 50
+    y = height - margin
+    pdf.setFont(font, font_size)
+    for text in render_txt(ingredients):
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font, font_size)
+            y = height - margin
+        pdf.drawString(margin, y, text.rstrip("\n"))
+        y -= font_size * 1.5
+    pdf.save()
+    yield buffer.getvalue()
+
+
+FORMATS = {
+    "csv": ("text/csv; charset=cp1251", "cp1251", render_csv),
+    "txt": ("text/plain; charset=utf-8", "utf-8", render_txt),
+    "json": ("application/json; charset=utf-8", "utf-8", render_json),
+    "pdf": ("application/pdf", None, render_pdf),
+}
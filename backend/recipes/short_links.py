@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import cache
+
+from foodgram_backend.settings import (
+    SHORT_LINK_CACHE_SIZE,
+    SHORT_LINK_CACHE_TIMEOUT,
+)
+from .models import Recipe
+
+CACHE_KEY = "short_url:{}"
+
+
+class LRUCache:
+    """Потокобезопасный LRU-словарь ограниченного размера."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+local_cache = LRUCache(SHORT_LINK_CACHE_SIZE)
+
+
+def resolve_short_url(short_url):
+    """Возвращает id рецепта по короткой ссылке или None.
+
+    Коды не переиспользуются, поэтому устаревшая запись в LRU другого
+    процесса ведёт лишь на страницу удалённого рецепта.
+    """
+    recipe_id = local_cache.get(short_url)
+    if recipe_id is not None:
+        return recipe_id
+
+    key = CACHE_KEY.format(short_url)
+    recipe_id = cache.get(key)
+    if recipe_id is None:
+        recipe_id = (
+            Recipe.objects.filter(short_url=short_url)
+            .values_list("id", flat=True)
+            .first()
+        )
+        if recipe_id is None:
+            return None
+        cache.set(key, recipe_id, SHORT_LINK_CACHE_TIMEOUT)
+
+    local_cache.set(short_url, recipe_id)
+    return recipe_id
+
+
+def forget_short_url(short_url):
+    local_cache.delete(short_url)
+    cache.delete(CACHE_KEY.format(short_url))
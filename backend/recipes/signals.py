@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cart_totals, search
+from .ingredient_index import ingredient_index
+from .models import (
+    CatalogVersion,
+    Favourites,
+    Ingredient,
+    IngredientsRecipe,
+    Recipe,
+    ShoppingList,
+    Tag,
+    TagsReciep,
+)
+from .relations import shift_recipe_counters
+from .short_links import forget_short_url
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Favourites)
+@receiver(post_save, sender=ShoppingList)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        shift_recipe_counters(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favourites)
+@receiver(post_delete, sender=ShoppingList)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    shift_recipe_counters(sender, [instance.recipe_id], -1)
+
+
+# Итоги списков покупок следуют за каждой строкой списка и состава,
+# в том числе за правками в админке. Пакетные записи (bulk_create,
+# bulk_update) сигналов не отправляют и переносят изменения в итоги сами.
+# При удалении рецепта каскад удаляет и строки списков, и строки состава;
+# в каком бы порядке это ни происходило, итоги остаются согласованными.
+TRACKED_FIELDS = {
+    ShoppingList: ("user_id", "recipe_id"),
+    IngredientsRecipe: ("recipe_id", "ingredient_id", "amount"),
+}
+
+
+@receiver(pre_save, sender=ShoppingList)
+@receiver(pre_save, sender=IngredientsRecipe)
+def remember_saved_row(sender, instance, **kwargs):
+    instance._saved_row = None
+    if not instance._state.adding:
+        instance._saved_row = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list(*TRACKED_FIELDS[sender])
+            .first()
+        )
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_cart_recipe_to_totals(sender, instance, created, **kwargs):
+    saved = instance.__dict__.pop("_saved_row", None)
+    current = (instance.user_id, instance.recipe_id)
+    if saved == current or not (created or saved):
+        return
+    if saved:
+        cart_totals.remove_recipe(*saved)
+    cart_totals.add_recipe(*current)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def remove_cart_recipe_from_totals(sender, instance, **kwargs):
+    cart_totals.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=IngredientsRecipe)
+def add_recipe_ingredient_to_totals(sender, instance, created, **kwargs):
+    saved = instance.__dict__.pop("_saved_row", None)
+    amount = instance.amount
+    if saved and saved[:2] == (instance.recipe_id, instance.ingredient_id):
+        amount -= saved[2]
+    elif saved:
+        cart_totals.shift_ingredient(saved[0], saved[1], -saved[2])
+    elif not created:
+        return
+    cart_totals.shift_ingredient(
+        instance.recipe_id, instance.ingredient_id, amount)
+
+
+@receiver(post_delete, sender=IngredientsRecipe)
+def remove_recipe_ingredient_from_totals(sender, instance, **kwargs):
+    cart_totals.shift_ingredient(
+        instance.recipe_id, instance.ingredient_id, -instance.amount)
+
+
+# Составы и теги меняются при сохранении рецепта, которое само
+# обновляет updated_at; отдельные сохранения и удаления строк (например,
+# в админке) тоже должны менять ETag и ключ кеша ответа.
+@receiver(post_save, sender=IngredientsRecipe)
+@receiver(post_save, sender=TagsReciep)
+@receiver(post_delete, sender=IngredientsRecipe)
+@receiver(post_delete, sender=TagsReciep)
+def touch_recipe(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def increment_author_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F("recipes_count") + 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_author_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id, recipes_count__gt=0).update(
+        recipes_count=F("recipes_count") - 1)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    CatalogVersion.bump(CatalogVersion.TAGS)
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_deleted_recipe_short_url(sender, instance, **kwargs):
+    if instance.short_url:
+        forget_short_url(instance.short_url)
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, **kwargs):
+    search.index_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    search.unindex_recipe(instance.id)
@@ -0,0 +1,749 @@
+import base64
+import json
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Barrier
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection
+from django.db.models import Exists, OuterRef
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from users.models import Follow, User
+from .models import (
+    Favourites,
+    Ingredient,
+    IngredientsRecipe,
+    Recipe,
+    ShoppingCartTotal,
+    ShoppingList,
+    Tag,
+    TagsReciep,
+)
+from .cart_totals import live_totals
+from .short_links import forget_short_url
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+IMAGE = "recipes/images/test.gif"
+GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!"
+    b"\xf9\x04\x01\x00\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01"
+    b"\x00\x00\x02\x02D\x01\x00;"
+)
+IMAGE_DATA = "data:image/gif;base64," + base64.b64encode(GIF).decode()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeTestCase(TestCase):
+    """Общие данные: два автора, теги, ингредиенты и рецепты второго
+    автора, на которого подписан первый."""
+
+    recipes_count = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@test.ru", username="user", password="password",
+            first_name="Имя", last_name="Фамилия",
+        )
+        cls.author = User.objects.create_user(
+            email="author@test.ru", username="author", password="password",
+            first_name="Автор", last_name="Авторов",
+        )
+        Follow.objects.create(user=cls.user, following=cls.author)
+        cls.tags = [
+            Tag.objects.create(name=f"Тег {i}", slug=f"tag{i}")
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {i}", measurement_unit="г")
+            for i in range(50)
+        ]
+        cls.recipes = [
+            cls.create_recipe(cls.author, f"Рецепт {i}")
+            for i in range(cls.recipes_count)
+        ]
+        Favourites.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingList.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    @classmethod
+    def create_recipe(cls, author, name, ingredients=3):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text=f"Описание: {name}",
+            cooking_time=10, image=IMAGE,
+        )
+        TagsReciep.objects.bulk_create(
+            TagsReciep(tag=tag, recipe=recipe) for tag in cls.tags[:2]
+        )
+        IngredientsRecipe.objects.bulk_create(
+            IngredientsRecipe(recipe=recipe, ingredient=ingredient, amount=i)
+            for i, ingredient in enumerate(
+                cls.ingredients[:ingredients], 1)
+        )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+
+
+class RecipeReadQueriesTest(RecipeTestCase):
+    """Чтение рецептов выполняет одно и то же число запросов
+    при любом размере страницы."""
+
+    page_sizes = (2, 8)
+
+    def assertListQueries(self, client, url, number):
+        for limit in self.page_sizes:
+            with self.subTest(url=url, limit=limit):
+                cache.clear()
+                with self.assertNumQueries(number):
+                    response = client.get(f"{url}&limit={limit}")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data["results"]), limit)
+
+    def test_list(self):
+        # COUNT, страница с отметками пользователя, версии справочников,
+        # рецепты без кеша, их теги, их ингредиенты, подписки.
+        self.assertListQueries(self.client, "/api/recipes/?page=1", 7)
+
+    def test_list_anonymous(self):
+        self.assertListQueries(self.anonymous, "/api/recipes/?page=1", 6)
+
+    def test_list_cached(self):
+        for limit in self.page_sizes:
+            self.client.get(f"/api/recipes/?limit={limit}")
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                self.client.get(f"/api/recipes/?limit={limit}")
+
+    def test_list_with_fields(self):
+        # COUNT, страница с автором, подписки.
+        self.assertListQueries(
+            self.client, "/api/recipes/?fields=id,name,author", 3)
+
+    def test_list_cursor(self):
+        self.assertListQueries(
+            self.client, "/api/recipes/?pagination=cursor", 6)
+
+    def test_search_vector_not_loaded(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get("/api/recipes/?limit=8")
+            self.client.get("/api/recipes/?limit=8&omit=text")
+            self.client.get(f"/api/recipes/{self.recipes[0].id}/")
+        self.assertTrue(context.captured_queries)
+        for query in context.captured_queries:
+            self.assertNotIn("search_vector", query["sql"])
+
+    def test_list_flags(self):
+        response = self.client.get("/api/recipes/?limit=10")
+        flags = {
+            recipe["id"]: (
+                recipe["is_favorited"],
+                recipe["is_in_shopping_cart"],
+                recipe["author"]["is_subscribed"],
+            )
+            for recipe in response.data["results"]
+        }
+        self.assertEqual(flags[self.recipes[0].id], (True, False, True))
+        self.assertEqual(flags[self.recipes[1].id], (False, True, True))
+        self.assertEqual(flags[self.recipes[2].id], (False, False, True))
+
+    def test_retrieve(self):
+        # Проверка ETag: рецепт с отметками, версии справочников,
+        # подписки; затем рецепт для кеша, а при промахе — рецепт,
+        # его теги и ингредиенты. Версии читаются один раз.
+        recipe = self.recipes[0]
+        with self.assertNumQueries(7):
+            response = self.client.get(f"/api/recipes/{recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["is_favorited"])
+        self.assertEqual(len(response.data["ingredients"]), 3)
+
+    def test_retrieve_many_ingredients(self):
+        recipe = self.create_recipe(self.author, "Большой", ingredients=30)
+        with self.assertNumQueries(7):
+            response = self.client.get(f"/api/recipes/{recipe.id}/")
+        self.assertEqual(len(response.data["ingredients"]), 30)
+
+    def test_short_link(self):
+        recipe = self.recipes[0]
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                f"/s/{recipe.short_url}/?format=json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["id"], recipe.id)
+
+    def test_short_link_redirect(self):
+        recipe = self.recipes[0]
+        forget_short_url(recipe.short_url)
+        with self.assertNumQueries(1):
+            response = self.anonymous.get(f"/s/{recipe.short_url}/")
+        self.assertRedirects(
+            response, f"/recipes/{recipe.id}", fetch_redirect_response=False)
+        with self.assertNumQueries(0):
+            self.anonymous.get(f"/s/{recipe.short_url}/")
+
+
+class RecipeWriteQueriesTest(RecipeTestCase):
+    """Создание и изменение рецепта выполняют одно и то же число
+    запросов при любом числе ингредиентов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def recipe_data(self, ingredients, tags=None):
+        return {
+            "name": "Новый рецепт",
+            "text": "Описание",
+            "cooking_time": 15,
+            "image": IMAGE_DATA,
+            "tags": [tag.id for tag in tags or self.tags[:2]],
+            "ingredients": [
+                {"id": ingredient.id, "amount": amount}
+                for amount, ingredient in enumerate(ingredients, 1)
+            ],
+        }
+
+    def test_create(self):
+        for count in (3, 30):
+            data = self.recipe_data(self.ingredients[:count])
+            with self.subTest(ingredients=count), self.assertNumQueries(16):
+                response = self.client.post(
+                    "/api/recipes/", data, format="json")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["ingredients"]), count)
+
+    def test_update(self):
+        # Состав меняется целиком: часть строк удаляется, часть
+        # добавляется, у остальных меняется количество; рецепт лежит
+        # в списке покупок, поэтому меняются и итоги.
+        for count in (3, 30):
+            recipe = self.create_recipe(
+                self.author, f"Рецепт {count}", ingredients=count)
+            ShoppingList.objects.create(user=self.user, recipe=recipe)
+            data = self.recipe_data(
+                self.ingredients[count // 2:count // 2 + count],
+                tags=self.tags[1:],
+            )
+            author = APIClient()
+            author.force_authenticate(self.author)
+            with self.subTest(ingredients=count), self.assertNumQueries(24):
+                response = author.patch(
+                    f"/api/recipes/{recipe.id}/", data, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["ingredients"]), count)
+        self.assertEqual(
+            dict(
+                self.user.shopping_cart_totals.values_list(
+                    "ingredient_id", "total_amount")
+            ),
+            {
+                ingredient_id: total
+                for (user_id, ingredient_id), total in live_totals().items()
+                if user_id == self.user.id
+            },
+        )
+
+    def test_validation(self):
+        data = self.recipe_data(self.ingredients[:30])
+        data["ingredients"][-1]["id"] = 10 ** 6
+        # Теги и ингредиенты проверяются одним запросом на модель.
+        with self.assertNumQueries(2):
+            response = self.client.post("/api/recipes/", data, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTest(RecipeTestCase):
+    def get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assertInvalidated(self, url, change):
+        """Ответ с прежним ETag — 304 до изменения и 200 после."""
+        etag = self.get(url)["ETag"]
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        change()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        return response
+
+    def test_recipe_edit(self):
+        recipe = self.recipes[2]
+        author = APIClient()
+        author.force_authenticate(self.author)
+
+        def edit():
+            author.patch(
+                f"/api/recipes/{recipe.id}/",
+                {
+                    "name": "Новое название",
+                    "text": "Описание",
+                    "cooking_time": 5,
+                    "tags": [self.tags[0].id],
+                    "ingredients": [
+                        {"id": self.ingredients[0].id, "amount": 100}],
+                },
+                format="json",
+            )
+
+        response = self.assertInvalidated(f"/api/recipes/{recipe.id}/", edit)
+        self.assertEqual(response.data["name"], "Новое название")
+
+    def test_ingredient_row_edit(self):
+        recipe = self.recipes[2]
+        row = recipe.ingredients_recipe.get(ingredient=self.ingredients[0])
+        row.amount = 100
+        response = self.assertInvalidated(
+            f"/api/recipes/{recipe.id}/", row.save)
+        self.assertIn(100, [row["amount"] for row in response.data[
+            "ingredients"]])
+
+    def test_ingredient_row_delete(self):
+        recipe = self.recipes[2]
+        row = recipe.ingredients_recipe.get(ingredient=self.ingredients[0])
+        response = self.assertInvalidated(
+            f"/api/recipes/{recipe.id}/", row.delete)
+        self.assertNotIn(
+            self.ingredients[0].id,
+            [ingredient["id"] for ingredient in response.data["ingredients"]],
+        )
+        response = self.anonymous.get("/api/recipes/?limit=10")
+        payload = next(
+            item for item in response.data["results"]
+            if item["id"] == recipe.id
+        )
+        self.assertEqual(len(payload["ingredients"]), 2)
+
+    def test_tag_row_delete(self):
+        recipe = self.recipes[2]
+        row = TagsReciep.objects.get(recipe=recipe, tag=self.tags[0])
+        response = self.assertInvalidated(
+            f"/api/recipes/{recipe.id}/", row.delete)
+        self.assertEqual(
+            [tag["id"] for tag in response.data["tags"]], [self.tags[1].id])
+
+    def test_author_edit(self):
+        def rename():
+            self.author.first_name = "Другое"
+            self.author.save()
+
+        response = self.assertInvalidated(
+            f"/api/recipes/{self.recipes[2].id}/", rename)
+        self.assertEqual(response.data["author"]["first_name"], "Другое")
+
+    def test_favorite(self):
+        recipe = self.recipes[2]
+        response = self.assertInvalidated(
+            f"/api/recipes/{recipe.id}/",
+            lambda: self.client.post(f"/api/recipes/{recipe.id}/favorite/"),
+        )
+        self.assertTrue(response.data["is_favorited"])
+
+    def test_catalogs(self):
+        self.assertInvalidated(
+            "/api/tags/",
+            lambda: Tag.objects.create(name="Новый", slug="new"),
+        )
+        self.assertInvalidated(
+            "/api/ingredients/",
+            lambda: Ingredient.objects.create(
+                name="Новый", measurement_unit="г"),
+        )
+
+    def test_invalid_pk(self):
+        for pk in ("abc", "1.5", "999999"):
+            with self.subTest(pk=pk):
+                response = self.client.get(f"/api/recipes/{pk}/")
+                self.assertEqual(response.status_code, 404)
+
+
+class IngredientAutocompleteTest(RecipeTestCase):
+    def test_one_query_per_keystroke(self):
+        self.anonymous.get("/api/ingredients/?name=инг")
+        for params in ("name=ингредиент 1", "search=ингридиент", ""):
+            with self.subTest(params=params), self.assertNumQueries(1):
+                response = self.anonymous.get(f"/api/ingredients/?{params}")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data)
+
+    def test_rebuilt_on_change(self):
+        self.anonymous.get("/api/ingredients/?name=соль")
+        Ingredient.objects.create(name="Соль", measurement_unit="г")
+        response = self.anonymous.get("/api/ingredients/?name=соль")
+        self.assertEqual([row["name"] for row in response.data], ["Соль"])
+
+
+class ShoppingCartDownloadTest(RecipeTestCase):
+    url = "/api/recipes/download_shopping_cart/"
+
+    def download(self, file_format):
+        response = self.client.get(f"{self.url}?format={file_format}")
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_formats(self):
+        self.assertIn(
+            "Ингредиент 0 - 1 (г)", self.download("txt").decode())
+        self.assertIn(
+            "Ингредиент 0 - 1 (г)", self.download("csv").decode("cp1251"))
+        self.assertEqual(
+            json.loads(self.download("json"))[0],
+            {"name": "Ингредиент 0", "measurement_unit": "г", "amount": 1},
+        )
+        self.assertTrue(self.download("pdf").startswith(b"%PDF"))
+
+    def test_unknown_format(self):
+        response = self.client.get(f"{self.url}?format=xml")
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch(
+        "recipes.shopping_list.SHOPPING_LIST_PDF_FONT", "/missing/font.ttf")
+    @mock.patch(
+        "recipes.shopping_list.pdfmetrics.getFont", side_effect=KeyError)
+    def test_pdf_without_font(self, get_font):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(f"{self.url}?format=pdf")
+
+
+class CursorPaginationTest(RecipeTestCase):
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.anonymous.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe["id"] for recipe in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_walk(self):
+        expected = [recipe.id for recipe in reversed(self.recipes)]
+        self.assertEqual(
+            self.walk("/api/recipes/?pagination=cursor&limit=3"), expected)
+
+    def test_equal_pub_date(self):
+        # Одинаковые pub_date различаются по id, страницы не теряют
+        # и не повторяют рецепты.
+        Recipe.objects.update(pub_date=self.recipes[0].pub_date)
+        expected = sorted(
+            (recipe.id for recipe in self.recipes), reverse=True)
+        self.assertEqual(
+            self.walk("/api/recipes/?pagination=cursor&limit=3"), expected)
+
+    def test_insert_while_paging(self):
+        response = self.anonymous.get(
+            "/api/recipes/?pagination=cursor&limit=4")
+        seen = [recipe["id"] for recipe in response.data["results"]]
+        self.create_recipe(self.author, "Новый")
+        seen += self.walk(response.data["next"])
+        self.assertEqual(
+            seen, [recipe.id for recipe in reversed(self.recipes)])
+
+    def test_search_rejected(self):
+        response = self.anonymous.get(
+            "/api/recipes/?pagination=cursor&search=рецепт")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("pagination", response.data)
+
+
+class SearchTest(RecipeTestCase):
+    """Совпадение в названии выше совпадения в описании, при равной
+    релевантности новые рецепты идут первыми. Фильтры сужают выдачу
+    поиска, не меняя порядок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.old_borsch = cls.create_found(
+            cls.author, "Борщ", "Свёкла и капуста.", cls.tags[0])
+        cls.new_borsch = cls.create_found(
+            cls.user, "Борщ", "Свёкла и капуста.", cls.tags[2])
+        cls.shchi = cls.create_found(
+            cls.author, "Щи", "Почти борщ, только без свёклы.", cls.tags[2])
+        cls.plov = cls.create_found(
+            cls.user, "Плов", "Рис и морковь.", cls.tags[2])
+        Favourites.objects.bulk_create(
+            Favourites(user=cls.user, recipe=recipe)
+            for recipe in (cls.old_borsch, cls.plov)
+        )
+        # Самый новый рецепт совпадает только описанием.
+        start = Recipe.objects.latest("pub_date").pub_date
+        for minutes, recipe in enumerate(
+            (cls.old_borsch, cls.new_borsch, cls.plov, cls.shchi), 1
+        ):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=start + timedelta(minutes=minutes))
+
+    @classmethod
+    def create_found(cls, author, name, text, tag):
+        recipe = Recipe.objects.create(
+            author=author, name=name, text=text, cooking_time=10,
+            image=IMAGE,
+        )
+        TagsReciep.objects.create(tag=tag, recipe=recipe)
+        return recipe
+
+    def search(self, query, params=""):
+        response = self.client.get(
+            f"/api/recipes/?search={query}&limit=20{params}")
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_ranking(self):
+        self.assertEqual(
+            self.search("борщ"),
+            [self.new_borsch.id, self.old_borsch.id, self.shchi.id],
+        )
+
+    def test_filters(self):
+        cases = (
+            (f"&author={self.user.id}", [self.new_borsch]),
+            (f"&author={self.author.id}", [self.old_borsch, self.shchi]),
+            ("&tags=tag2", [self.new_borsch, self.shchi]),
+            ("&tags=tag0&tags=tag2",
+             [self.new_borsch, self.old_borsch, self.shchi]),
+            ("&is_favorited=1", [self.old_borsch]),
+            ("&is_favorited=0", [self.new_borsch, self.shchi]),
+            (f"&is_favorited=0&tags=tag2&author={self.author.id}",
+             [self.shchi]),
+        )
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.search("борщ", params),
+                    [recipe.id for recipe in expected],
+                )
+
+    def test_edit_reindexes(self):
+        self.plov.name = "Борщ"
+        self.plov.save()
+        self.assertIn(self.plov.id, self.search("борщ"))
+        self.assertNotIn(self.plov.id, self.search("плов"))
+        self.plov.text = "Рис и чечевица."
+        self.plov.save(update_fields=["text"])
+        self.assertEqual(self.search("чечевица"), [self.plov.id])
+
+
+class IndexUsageTest(TestCase):
+    """Горячие запросы к таблицам связей идут по составным индексам
+    (EXPLAIN). Разбираются планы SQLite и PostgreSQL."""
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # На почти пустых таблицах планировщик предпочёл бы полный
+            # просмотр даже при наличии индекса.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        elif connection.vendor != "sqlite":
+            self.skipTest(f"План {connection.vendor} не разбирается.")
+
+    def assertUsesIndex(self, queryset, table, columns, ordered=False):
+        plan = queryset.explain()
+        if connection.vendor == "postgresql":
+            self.assertNotIn(f"Seq Scan on {table}", plan)
+            self.assertRegex(plan, rf"Index Cond: .*\b{columns[0]} =")
+            if ordered:
+                self.assertNotIn("Sort", plan)
+            return
+        condition = re.escape(
+            " AND ".join(f"{column}=?" for column in columns))
+        self.assertRegex(
+            plan, rf"SEARCH \w+ USING (COVERING )?INDEX \w+ \({condition}")
+        if ordered:
+            self.assertNotIn("TEMP B-TREE FOR ORDER BY", plan)
+
+    def test_relation_lookups(self):
+        for model, field in (
+            (Favourites, "recipe"),
+            (ShoppingList, "recipe"),
+            (Follow, "following"),
+        ):
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(
+                    model.objects.filter(
+                        user_id=1, **{f"{field}_id": 1}).order_by(),
+                    model._meta.db_table,
+                    ("user_id", f"{field}_id"),
+                )
+
+    def test_relation_filters(self):
+        for model in (Favourites, ShoppingList):
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(
+                    Recipe.objects.filter(
+                        Exists(
+                            model.objects.filter(
+                                user_id=1, recipe=OuterRef("pk"))
+                        )
+                    ),
+                    model._meta.db_table,
+                    ("user_id", "recipe_id"),
+                )
+
+    def test_tag_filter(self):
+        self.assertUsesIndex(
+            TagsReciep.objects.filter(tag_id=1).values("recipe_id"),
+            TagsReciep._meta.db_table,
+            ("tag_id",),
+        )
+
+    def test_author_recipes(self):
+        self.assertUsesIndex(
+            Recipe.objects.filter(author_id=1).order_by("-pub_date"),
+            Recipe._meta.db_table,
+            ("author_id",),
+            ordered=True,
+        )
+
+    def test_cart_totals(self):
+        self.assertUsesIndex(
+            ShoppingCartTotal.objects.filter(user_id=1).order_by(),
+            ShoppingCartTotal._meta.db_table,
+            ("user_id",),
+        )
+
+
+class ToggleTest(RecipeTestCase):
+    def test_repeat(self):
+        recipe = self.recipes[2]
+        for model, path, counter in (
+            (Favourites, "favorite", "favorites_count"),
+            (ShoppingList, "shopping_cart", "in_carts_count"),
+        ):
+            url = f"/api/recipes/{recipe.id}/{path}/"
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.client.post(url).status_code, 201)
+                self.assertEqual(self.client.post(url).status_code, 400)
+                recipe.refresh_from_db()
+                self.assertEqual(getattr(recipe, counter), 1)
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertEqual(self.client.delete(url).status_code, 400)
+                recipe.refresh_from_db()
+                self.assertEqual(getattr(recipe, counter), 0)
+                self.assertEqual(
+                    self.client.delete(
+                        f"/api/recipes/999999/{path}/").status_code,
+                    404,
+                )
+
+    def test_delete_rolls_back_with_counter(self):
+        recipe = self.recipes[2]
+        for model, path in (
+            (Favourites, "favorite"),
+            (ShoppingList, "shopping_cart"),
+        ):
+            url = f"/api/recipes/{recipe.id}/{path}/"
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.client.post(url).status_code, 201)
+                with mock.patch(
+                    "recipes.signals.shift_recipe_counters",
+                    side_effect=DatabaseError,
+                ), self.assertRaises(DatabaseError):
+                    self.client.delete(url)
+                self.assertTrue(
+                    model.objects.filter(
+                        user=self.user, recipe=recipe).exists()
+                )
+
+
+@override_settings(CACHES=TEST_CACHES)
+@skipUnlessDBFeature("test_db_allows_multiple_connections")
+class ConcurrentToggleTest(TransactionTestCase):
+    """Одновременные запросы на добавление создают одну связь.
+
+    Нужна база, принимающая запись из нескольких соединений сразу
+    (PostgreSQL); в тестовой базе SQLite в памяти тест пропускается.
+    """
+
+    workers = 8
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@test.ru", username="user", password="password")
+        self.author = User.objects.create_user(
+            email="author@test.ru", username="author", password="password")
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Рецепт", text="Описание",
+            cooking_time=10, image=IMAGE,
+        )
+
+    def parallel(self, method, url):
+        barrier = Barrier(self.workers)
+
+        def request(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                return getattr(client, method)(url).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            return sorted(executor.map(request, range(self.workers)))
+
+    def test_add(self):
+        for model, path, counter in (
+            (Favourites, "favorite", "favorites_count"),
+            (ShoppingList, "shopping_cart", "in_carts_count"),
+        ):
+            with self.subTest(model=model.__name__):
+                statuses = self.parallel(
+                    "post", f"/api/recipes/{self.recipe.id}/{path}/")
+                self.assertEqual(
+                    statuses, [201] + [400] * (self.workers - 1))
+                self.assertEqual(
+                    model.objects.filter(
+                        user=self.user, recipe=self.recipe).count(),
+                    1,
+                )
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), 1)
+
+    def test_remove(self):
+        Favourites.objects.create(user=self.user, recipe=self.recipe)
+        statuses = self.parallel(
+            "delete", f"/api/recipes/{self.recipe.id}/favorite/")
+        self.assertEqual(statuses, [204] + [400] * (self.workers - 1))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_subscribe(self):
+        statuses = self.parallel(
+            "post", f"/api/users/{self.author.id}/subscribe/")
+        self.assertEqual(statuses, [201] + [400] * (self.workers - 1))
+        self.assertEqual(
+            Follow.objects.filter(
+                user=self.user, following=self.author).count(),
+            1,
+        )
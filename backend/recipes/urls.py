@@ -3,6 +3,8 @@ from rest_framework import routers
 from django.urls import include, path
 
 from .views import (
+    BulkFavoriteView,
+    BulkShoppingListView,
     DownloadShoppingListViewSet,
     FavoriteViewSet,
     IngredientViewSet,
@@ -29,5 +31,7 @@ router.register(
 urlpatterns = [
     path("recipes/download_shopping_cart/",
          DownloadShoppingListViewSet.as_view()),
+    path("recipes/favorite/", BulkFavoriteView.as_view()),
+    path("recipes/shopping_cart/", BulkShoppingListView.as_view()),
     path("", include(router.urls)),
 ]
@@ -1,4 +1,3 @@
-import csv
 import os
 from http import HTTPStatus
 
@@ -10,20 +9,52 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.http import HttpResponse
+from django.http import (
+    Http404,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 
-from .filters import IngredientFilter, RecipeFilter
-from .models import Favourites, Ingredient, IngredientsRecipe, Recipe, Tag
+from foodgram_backend.settings import (
+    SHOPPING_LIST_CHUNK_SIZE,
+    SHORT_LINK_CACHE_TIMEOUT,
+)
+from users.pagination import RecipeCursorPagination
+from users.representation import requested_fields
+from . import cart_totals
+from .conditional import catalog_validators, conditional, recipe_validators
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .models import (
+    CatalogVersion,
+    Favourites,
+    Ingredient,
+    Recipe,
+    ShoppingCartTotal,
+    ShoppingList,
+    Tag,
+)
+from .payload_cache import RecipePayloads
 from .permissions import AuthorPermission
 from .serializers import (
+    BulkIdsSerializer,
     FavoriteSerializer,
     IngredientSerializer,
     RecipeSerializer,
     ShoppingListSerializer,
     TagSerializer,
 )
-from django.db.models import Sum
+from .relations import (
+    add_relations,
+    remove_relation,
+    remove_relations,
+    shift_recipe_counters,
+)
+from .shopping_list import FORMATS as SHOPPING_LIST_FORMATS
+from .short_links import resolve_short_url
 
 load_dotenv(override=True)
 
@@ -34,14 +65,37 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    @conditional(catalog_validators(CatalogVersion.TAGS))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(catalog_validators(CatalogVersion.TAGS))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    catalog_version = None
+
+    @conditional(catalog_validators(CatalogVersion.INGREDIENTS))
+    def list(self, request, *args, **kwargs):
+        version = self.catalog_version
+        search = request.query_params.get("search")
+        if search:
+            return Response(
+                ingredient_index.ranked_search(search, version=version))
+        name = request.query_params.get("name")
+        if name:
+            return Response(ingredient_index.search(name, version=version))
+        return Response(ingredient_index.all(version))
+
+    @conditional(catalog_validators(CatalogVersion.INGREDIENTS))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -50,6 +104,48 @@ class RecipeViewSet(viewsets.ModelViewSet):
     permission_classes = (AuthorPermission,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    catalog_versions = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.request.query_params.get("pagination") == "cursor":
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def use_payload_cache(self):
+        return self.action in ("list", "retrieve") and (
+            requested_fields(self.request, RecipeSerializer) is None
+        )
+
+    def get_queryset(self):
+        if self.use_payload_cache():
+            queryset = Recipe.objects.for_payload(self.request.user)
+        else:
+            queryset = Recipe.objects.for_read(
+                self.request.user,
+                requested_fields(self.request, RecipeSerializer),
+            )
+        return queryset.order_by("-pub_date")
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_payload_cache():
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()))
+        return self.get_paginated_response(
+            RecipePayloads(request).render(page))
+
+    @conditional(recipe_validators, private=True)
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_payload_cache():
+            return super().retrieve(request, *args, **kwargs)
+        return Response(
+            RecipePayloads(request, self.catalog_versions).render(
+                [self.get_object()])[0]
+        )
 
     @action(detail=True, methods=["GET"], url_path="get-link")
     def get_link(self, request, pk=None):
@@ -63,76 +159,177 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = (IsAuthenticated,)
     http_method_names = ["delete", "post"]
+    missing_relation_errors = None
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(
             user=self.request.user,
-            recipe=get_object_or_404(Recipe, id=self.kwargs.get("recipe_id")),
+            recipe=get_object_or_404(
+                Recipe.objects.only("id", "name", "image", "cooking_time"),
+                id=self.kwargs.get("recipe_id"),
+            ),
         )
 
+    @transaction.atomic
     def delete(self, request, recipe_id):
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not recipe.favorites_recipe.filter(
-                user__id=request.user.id).exists():
-            return Response(status=HTTPStatus.BAD_REQUEST)
-
-        get_object_or_404(
-            Favourites,
-            user=self.request.user,
-            recipe=get_object_or_404(Recipe, id=recipe_id),
-        ).delete()
-        return Response(status=HTTPStatus.NO_CONTENT)
+        if remove_relation(
+            self.serializer_class.Meta.model,
+            user_id=request.user.id,
+            recipe_id=recipe_id,
+        ):
+            return Response(status=HTTPStatus.NO_CONTENT)
+        if not Recipe.objects.filter(id=recipe_id).exists():
+            raise Http404
+        return Response(
+            self.missing_relation_errors, status=HTTPStatus.BAD_REQUEST)
 
 
 class ShoppingListViewSet(FavoriteViewSet):
     serializer_class = ShoppingListSerializer
+    missing_relation_errors = {
+        "errors": "Такого рецепта нет в списке покупок."
+    }
 
-    def delete(self, request, recipe_id):
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        shop_list = recipe.shoppinglist_recipe.filter(user__id=request.user.id)
 
-        if shop_list.exists():
-            shop_list.delete()
-            return Response(status=HTTPStatus.NO_CONTENT)
+class BulkRelationView(APIView):
+    """Пакетное добавление и удаление связей пользователя.
+
+    Принимает {"ids": [...]} и применяет весь список одним запросом.
+    В ответе для каждого id — код, который вернул бы одиночный запрос.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    model = None
+    field = None
+    target_model = None
 
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data["ids"]))
+
+    def existing(self, ids):
+        if not ids:
+            return set()
+        return set(
+            self.target_model.objects.filter(id__in=ids).values_list(
+                "id", flat=True)
+        )
+
+    def on_added(self, user_id, ids):
+        pass
+
+    def on_removed(self, user_id, ids):
+        pass
+
+    @staticmethod
+    def results(ids, done, found, success):
         return Response(
-            {"errors": "Такого рецепта нет в списке покупок."},
-            status=HTTPStatus.BAD_REQUEST,
+            {
+                "results": [
+                    {
+                        "id": target_id,
+                        "status": (
+                            success if target_id in done
+                            else HTTPStatus.BAD_REQUEST if target_id in found
+                            else HTTPStatus.NOT_FOUND
+                        ),
+                    }
+                    for target_id in ids
+                ]
+            }
+        )
+
+    @transaction.atomic
+    def post(self, request):
+        ids = self.get_ids(request)
+        found = self.existing(ids)
+        added = add_relations(
+            self.model,
+            self.field,
+            [target_id for target_id in ids if target_id in found],
+            user=request.user.id,
         )
+        if added:
+            self.on_added(request.user.id, added)
+        return self.results(ids, added, found, HTTPStatus.CREATED)
+
+    @transaction.atomic
+    def delete(self, request):
+        ids = self.get_ids(request)
+        removed = remove_relations(
+            self.model, self.field, ids, user=request.user.id)
+        if removed:
+            self.on_removed(request.user.id, removed)
+        found = removed | self.existing(
+            [target_id for target_id in ids if target_id not in removed]
+        )
+        return self.results(ids, removed, found, HTTPStatus.NO_CONTENT)
+
+
+class BulkFavoriteView(BulkRelationView):
+    model = Favourites
+    field = "recipe"
+    target_model = Recipe
+
+    def on_added(self, user_id, ids):
+        shift_recipe_counters(self.model, ids, 1)
+
+    def on_removed(self, user_id, ids):
+        shift_recipe_counters(self.model, ids, -1)
+
+
+class BulkShoppingListView(BulkFavoriteView):
+    model = ShoppingList
+
+    def on_added(self, user_id, ids):
+        super().on_added(user_id, ids)
+        cart_totals.add_recipes(user_id, ids)
+
+    def on_removed(self, user_id, ids):
+        super().on_removed(user_id, ids)
+        cart_totals.remove_recipes(user_id, ids)
 
 
 class DownloadShoppingListViewSet(APIView):
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request):
+        file_format = request.query_params.get("format", "csv")
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {
+                    "errors": "Доступные форматы: "
+                    f'{", ".join(SHOPPING_LIST_FORMATS)}.'
+                },
+                status=HTTPStatus.BAD_REQUEST,
+            )
+        content_type, charset, render = SHOPPING_LIST_FORMATS[file_format]
+
         ingredients = (
-            IngredientsRecipe.objects.filter(
-                recipe__shoppinglist_recipe__user=request.user
+            ShoppingCartTotal.objects.filter(user=request.user)
+            .values(
+                "ingredient__name",
+                "ingredient__measurement_unit",
+                "total_amount",
             )
-            .values("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total_amount=Sum("amount"))
             .order_by("ingredient__name")
+            .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
         )
 
-        response = HttpResponse(
-            content_type="text/csv",
+        return StreamingHttpResponse(
+            render(ingredients),
+            content_type=content_type,
+            charset=charset,
             headers={
                 "Content-Disposition": "attachment; "
-                'filename="Shopping_cart.csv"'
+                f'filename="Shopping_cart.{file_format}"'
             },
-            charset="cp1251",
         )
 
-        writer = csv.writer(response)
-        writer.writerow(["Список покупок:"])
-
-        for ingredient in ingredients:
-            ingredient_name = ingredient["ingredient__name"]
-            amount = ingredient["total_amount"]
-            measurement_unit = ingredient["ingredient__measurement_unit"]
-            writer.writerow(
-                [f"{ingredient_name} - {amount} ({measurement_unit})"])
-
-        return response
-
 
 class GetRecipeShortLink(APIView):
     serializer_class = RecipeSerializer
@@ -140,6 +337,17 @@ class GetRecipeShortLink(APIView):
     permission_classes = (AllowAny,)
 
     def get(self, request, short_url):
-        recipe = get_object_or_404(Recipe, short_url=short_url)
-        serializer = RecipeSerializer(recipe, context={"request": request})
-        return Response(serializer.data)
+        if request.query_params.get("format") == "json":
+            recipe = get_object_or_404(
+                Recipe.objects.for_read(request.user), short_url=short_url
+            )
+            serializer = RecipeSerializer(recipe, context={"request": request})
+            return Response(serializer.data)
+
+        recipe_id = resolve_short_url(short_url)
+        if recipe_id is None:
+            raise Http404
+        response = HttpResponseRedirect(f"/recipes/{recipe_id}")
+        patch_cache_control(
+            response, public=True, max_age=SHORT_LINK_CACHE_TIMEOUT)
+        return response
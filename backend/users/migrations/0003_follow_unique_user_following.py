@@ -0,0 +1,34 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    groups = (
+        Follow.objects.values('user', 'following')
+        .annotate(keep_id=models.Min('id'), copies=models.Count('id'))
+        .filter(copies__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        Follow.objects.filter(
+            user=group['user'], following=group['following']
+        ).exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'following'), name='Unique pair user-following'),
+        ),
+    ]
@@ -18,6 +18,8 @@ class User(AbstractUser):
     avatar = models.ImageField(
         "Аватар", upload_to="users/", null=True, default=None, blank=True
     )
+    recipes_count = models.PositiveIntegerField(
+        "Количество рецептов", default=0, editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -49,6 +51,11 @@ class Follow(models.Model):
         verbose_name = "подписка"
         verbose_name_plural = "Подписки"
         ordering = ["user"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "following"], name="Unique pair user-following"
+            )
+        ]
 
     def __str__(self):
         return f"Подписка {self.user.username} на {self.following.username}"
@@ -1,5 +1,34 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = "limit"
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Курсор DRF хранит pub_date последней выданной записи и смещение
+    среди записей с той же pub_date; id упорядочивает такие записи,
+    поэтому смещение всегда указывает на одно и то же место. Новые
+    рецепты получают более позднюю pub_date и попадают в начало ленты,
+    не сдвигая уже выданные страницы.
+
+    Порядок задаёт курсор, поэтому с ?search= (сортировка по
+    релевантности) этот режим не сочетается.
+    """
+
+    ordering = ("-pub_date", "-id")
+    page_size_query_param = "limit"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get("search"):
+            raise ValidationError(
+                {
+                    "pagination": [
+                        "Поиск нельзя совмещать с pagination=cursor."
+                    ]
+                }
+            )
+        return super().paginate_queryset(queryset, request, view)
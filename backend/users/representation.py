@@ -0,0 +1,216 @@
+from collections.abc import Mapping
+from copy import deepcopy
+from operator import attrgetter
+
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
+from django.utils.functional import cached_property
+
+
+def _identity(value):
+    return value
+
+
+def _file_converter(field):
+    """Повторяет FileField.to_representation без повторного разбора
+    настроек на каждом объекте."""
+    use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+    request = field.context.get("request")
+
+    def convert(value):
+        if not value:
+            return None
+        if not use_url:
+            return value.name
+        try:
+            url = value.url
+        except AttributeError:
+            return None
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    return convert
+
+
+def _nested_converter(serializer):
+    if isinstance(serializer, serializers.ListSerializer):
+        convert_item = _nested_converter(serializer.child)
+
+        def convert(value):
+            if isinstance(value, models.Manager):
+                value = value.all()
+            return [convert_item(item) for item in value]
+
+        return convert
+    to_representation = type(serializer).to_representation
+    if to_representation in (
+        serializers.Serializer.to_representation,
+        FastRepresentationMixin.to_representation,
+    ):
+        return compile_plan(serializer)
+    return serializer.to_representation
+
+
+CONVERTERS = {
+    serializers.IntegerField.to_representation: int,
+    serializers.CharField.to_representation: str,
+    serializers.FileField.to_representation: _file_converter,
+}
+
+
+def _step(field):
+    if isinstance(field, serializers.SerializerMethodField):
+        return (
+            field.field_name,
+            _identity,
+            getattr(field.parent, field.method_name),
+            field,
+        )
+    if isinstance(field, serializers.BaseSerializer):
+        convert = _nested_converter(field)
+    else:
+        convert = CONVERTERS.get(type(field).to_representation)
+        if convert is _file_converter:
+            convert = _file_converter(field)
+        elif convert is None:
+            convert = field.to_representation
+    if field.source == "*":
+        getter = _identity
+    else:
+        getter = attrgetter(".".join(field.source_attrs))
+    return field.field_name, getter, convert, field
+
+
+def compile_plan(serializer):
+    """Собирает план вывода: для каждого читаемого поля заранее
+    выбирается способ получить значение и преобразовать его.
+
+    Результат плана совпадает с Serializer.to_representation.
+    """
+    steps = [_step(field) for field in serializer._readable_fields]
+
+    def represent(instance):
+        if isinstance(instance, Mapping):
+            return serializers.Serializer.to_representation(
+                serializer, instance)
+        data = {}
+        for name, getter, convert, field in steps:
+            try:
+                value = getter(instance)
+            except (AttributeError, KeyError, ObjectDoesNotExist):
+                value = field.get_attribute(instance)
+            data[name] = None if value is None else convert(value)
+        return data
+
+    return represent
+
+
+class FastRepresentationMixin:
+    """Вывод объектов по плану, собранному один раз на сериализатор,
+    вместо обхода полей DRF для каждого объекта."""
+
+    @cached_property
+    def _represent(self):
+        return compile_plan(self)
+
+    def to_representation(self, instance):
+        return self._represent(instance)
+
+
+def parse_paths(value):
+    """'id,author.username' -> {'id': {}, 'author': {'username': {}}}."""
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in path.strip().split("."):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def get_selection(request):
+    """Разбирает ?fields=, ?omit= и ?expand= запроса на чтение.
+
+    Возвращает (fields, omit, expand) или None, если параметров нет;
+    fields равно None, когда список полей не ограничен.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    params = request.query_params
+    if not any(params.get(name) for name in ("fields", "omit", "expand")):
+        return None
+    only = params.get("fields")
+    return (
+        parse_paths(only) if only else None,
+        parse_paths(params.get("omit", "")),
+        parse_paths(params.get("expand", "")),
+    )
+
+
+def _is_selected(name, selection):
+    only, omit, expand = selection
+    if name in expand:
+        return True
+    return (only is None or name in only) and omit.get(name) != {}
+
+
+def requested_fields(request, serializer_class):
+    """Поля верхнего уровня, которые попадут в ответ, или None,
+    если запрошен ответ целиком."""
+    selection = get_selection(request)
+    if selection is None:
+        return None
+    names = [
+        *serializer_class.Meta.fields,
+        *getattr(serializer_class.Meta, "expandable_fields", {}),
+    ]
+    return {name for name in names if _is_selected(name, selection)}
+
+
+class SparseFieldsMixin:
+    """Выбор полей ответа через ?fields= и ?omit= и дополнительных
+    полей из Meta.expandable_fields через ?expand=.
+
+    Пути через точку («author.username») передаются вложенным
+    сериализаторам с этим же миксином.
+    """
+
+    selection = None
+
+    def _is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.selection
+        if selection is None and self._is_root():
+            selection = get_selection(self.context.get("request"))
+        if selection is None:
+            return fields
+        only, omit, expand = selection
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        for name in expand:
+            if name in expandable:
+                fields[name] = deepcopy(expandable[name])
+        for name in list(fields):
+            if not _is_selected(name, selection):
+                del fields[name]
+                continue
+            nested = fields[name]
+            if isinstance(nested, serializers.ListSerializer):
+                nested = nested.child
+            if isinstance(nested, SparseFieldsMixin):
+                nested.selection = (
+                    (only.get(name) or None) if only is not None else None,
+                    omit.get(name, {}),
+                    expand.get(name, {}),
+                )
+        return fields
@@ -1,12 +1,15 @@
 import base64
 
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 from django.shortcuts import get_object_or_404
 
 from recipes.models import Recipe
+from recipes.relations import add_relation
 from .models import Follow
+from .representation import FastRepresentationMixin, SparseFieldsMixin
 
 User = get_user_model()
 
@@ -21,6 +24,23 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+def get_subscribed_ids(request):
+    """Id авторов, на которых подписан текущий пользователь.
+
+    Загружаются один раз за запрос и переиспользуются всеми
+    сериализаторами ответа.
+    """
+    if request.user.is_anonymous:
+        return frozenset()
+    if not hasattr(request, "subscribed_ids"):
+        request.subscribed_ids = set(
+            Follow.objects.filter(user=request.user).values_list(
+                "following_id", flat=True
+            )
+        )
+    return request.subscribed_ids
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField()
 
@@ -34,7 +54,9 @@ class AvatarSerializer(serializers.ModelSerializer):
         return instance
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    SparseFieldsMixin, FastRepresentationMixin, serializers.ModelSerializer
+):
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField()
 
@@ -49,11 +71,12 @@ class UserSerializer(serializers.ModelSerializer):
             "is_subscribed",
             "avatar",
         )
+        expandable_fields = {
+            "recipes_count": serializers.IntegerField(read_only=True),
+        }
 
     def get_is_subscribed(self, obj) -> bool:
-        return obj.followings_user.filter(
-            following_id=self.context["request"].user.id
-        ).exists()
+        return obj.id in get_subscribed_ids(self.context["request"])
 
 
 class UserCreateSerializer(serializers.ModelSerializer):
@@ -81,6 +104,18 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return user
 
 
+def get_recipes_limit(request):
+    recipes_limit = request.GET.get("recipes_limit")
+    if not recipes_limit:
+        return None
+    if not recipes_limit.isdigit():
+        raise serializers.ValidationError(
+            "Параметр recipes_limit должен быть "
+            "целым положительным числом."
+        )
+    return int(recipes_limit)
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
@@ -92,6 +127,8 @@ class FollowSerializer(UserSerializer):
     recipes_count = serializers.SerializerMethodField()
     avatar = Base64ImageField(read_only=True)
 
+    impossible = "Подписка уже существует или невозможна."
+
     class Meta(UserSerializer.Meta):
         fields = (
             "email",
@@ -114,43 +151,34 @@ class FollowSerializer(UserSerializer):
             "recipes",
             "recipes_count",
         )
+        expandable_fields = {}
 
     def get_recipes_count(self, obj) -> int:
-        return obj.recipes_author.all().count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        recipes = obj.recipes_author.all()
-        serialize_recipes = []
-        for recipe in recipes:
-            serializer = ShortRecipeSerializer(recipe)
-            serialize_recipes.append(serializer.data)
-
-        recipes_limit = self.context["request"].GET.get("recipes_limit")
-        if recipes_limit:
-            if not recipes_limit.isdigit():
-                raise serializers.ValidationError(
-                    "Параметр recipes_limit должен быть "
-                    "целым положительным числом."
-                )
-            return serialize_recipes[: int(recipes_limit)]
-
-        return serialize_recipes
+        if hasattr(obj, "recipes_preview"):
+            recipes = obj.recipes_preview
+        else:
+            recipes = obj.recipes_author.all()
+            recipes_limit = get_recipes_limit(self.context["request"])
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return ShortRecipeSerializer(recipes, many=True).data
 
     def save(self, **kwargs):
-        user_id = self.context["request"].user.id
-        following_id = self.context["view"].kwargs.get("user_id")
-        Follow.objects.create(following_id=following_id, user_id=user_id)
-        return User.objects.get(id=following_id)
+        if add_relation(
+            Follow,
+            user_id=self.context["request"].user.id,
+            following_id=self.validated_data.id,
+        ) is None:
+            raise serializers.ValidationError(
+                {api_settings.NON_FIELD_ERRORS_KEY: [self.impossible]}
+            )
+        return self.validated_data
 
     def validate(self, data):
-        user_id = self.context["request"].user.id
         following_id = int(self.context["view"].kwargs.get("user_id"))
-        following_user = get_object_or_404(User, id=following_id)
-
-        if following_user.followings.filter(user_id=user_id).exists() or (
-            user_id == following_id
-        ):
-            raise serializers.ValidationError(
-                "Подписка уже существует или невозможна."
-            )
-        return following_user
+        if self.context["request"].user.id == following_id:
+            raise serializers.ValidationError(self.impossible)
+        return get_object_or_404(User, id=following_id)
@@ -0,0 +1,85 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.tests import IMAGE, TEST_CACHES
+from .models import Follow, User
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SubscriptionsTest(TestCase):
+    """Превью рецептов строится только для авторов текущей страницы."""
+
+    authors_count = 10
+    recipes_per_author = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email="user@test.ru", username="user", password="password")
+        cls.authors = []
+        for i in range(cls.authors_count):
+            author = User.objects.create_user(
+                email=f"author{i}@test.ru", username=f"author{i:02}",
+                password="password",
+            )
+            Follow.objects.create(user=cls.user, following=author)
+            for j in range(cls.recipes_per_author):
+                Recipe.objects.create(
+                    author=author, name=f"Рецепт {i}-{j}",
+                    text="Описание", cooking_time=10, image=IMAGE,
+                )
+            cls.authors.append(author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_queries_do_not_depend_on_follows(self):
+        # COUNT, страница авторов, превью рецептов, подписки.
+        for limit in (2, 4):
+            url = f"/api/users/subscriptions/?limit={limit}&recipes_limit=2"
+            with self.subTest(limit=limit), CaptureQueriesContext(
+                connection
+            ) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(queries), 4)
+            self.assertEqual(response.data["count"], self.authors_count)
+
+            ranked = [
+                query["sql"] for query in queries
+                if "ROW_NUMBER" in query["sql"]
+            ]
+            self.assertEqual(len(ranked), 1)
+            authors = re.search(
+                r"WHERE author_id IN \(([^)]*)\)", ranked[0]).group(1)
+            self.assertEqual(len(authors.split(",")), limit)
+
+    def test_previews(self):
+        response = self.client.get(
+            "/api/users/subscriptions/?limit=3&recipes_limit=2")
+        for data in response.data["results"]:
+            with self.subTest(author=data["username"]):
+                expected = list(
+                    Recipe.objects.filter(author_id=data["id"])
+                    .order_by("-pub_date", "-id")
+                    .values_list("id", flat=True)[:2]
+                )
+                self.assertEqual(
+                    [recipe["id"] for recipe in data["recipes"]], expected)
+                self.assertEqual(
+                    data["recipes_count"], self.recipes_per_author)
+
+    def test_without_recipes_limit(self):
+        response = self.client.get("/api/users/subscriptions/?limit=2")
+        self.assertEqual(
+            [len(data["recipes"]) for data in response.data["results"]],
+            [self.recipes_per_author] * 2,
+        )
@@ -2,7 +2,12 @@ from rest_framework import routers
 
 from django.urls import include, path
 
-from .views import FollowViewSet, SubscribeViewSet, UsersMeViewSet
+from .views import (
+    BulkUnsubscribeView,
+    FollowViewSet,
+    SubscribeViewSet,
+    UsersMeViewSet,
+)
 
 router = routers.DefaultRouter()
 router.register(r"users/subscriptions", FollowViewSet, basename="myfollows")
@@ -13,6 +18,7 @@ router.register(r"users", UsersMeViewSet, basename="usersme")
 
 urlpatterns = [
     path("auth/", include("djoser.urls.authtoken")),
+    path("users/subscribe/", BulkUnsubscribeView.as_view()),
     path("", include(router.urls)),
     path("", include("djoser.urls")),
 ]
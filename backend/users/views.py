@@ -8,11 +8,23 @@ from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.http import Http404
 from djoser.views import UserViewSet
 
+from recipes.models import Recipe
+from recipes.relations import remove_relation
+from recipes.views import BulkRelationView
+from .models import Follow
 from .pagination import CustomPagination
-from .serializers import AvatarSerializer, FollowSerializer, UserSerializer
+from .representation import requested_fields
+from .serializers import (
+    AvatarSerializer,
+    FollowSerializer,
+    UserSerializer,
+    get_recipes_limit,
+)
 
 load_dotenv(override=True)
 
@@ -27,7 +39,48 @@ class FollowViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ("=following__username",)
 
     def get_queryset(self):
-        return User.objects.filter(followings__user=self.request.user)
+        return User.objects.filter(
+            followings__user=self.request.user).order_by("username")
+
+    def previews(self, authors):
+        """Последние рецепты авторов страницы, не больше recipes_limit
+        на автора: окно ранжирует только рецепты этих авторов."""
+        recipes = Recipe.objects.only(
+            "id", "name", "image", "cooking_time", "author_id"
+        ).order_by("-pub_date", "-id")
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit is None or not authors:
+            return recipes
+        placeholders = ", ".join(["%s"] * len(authors))
+        return recipes.filter(
+            id__in=RawSQL(
+                "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                "PARTITION BY author_id ORDER BY pub_date DESC, id DESC"
+                f") AS position FROM {Recipe._meta.db_table} "
+                f"WHERE author_id IN ({placeholders})"
+                ") AS ranked WHERE position <= %s",
+                (*(author.id for author in authors), recipes_limit),
+            )
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        authors = list(queryset) if page is None else page
+        fields = requested_fields(request, FollowSerializer)
+        if fields is None or "recipes" in fields:
+            prefetch_related_objects(
+                authors,
+                Prefetch(
+                    "recipes_author",
+                    queryset=self.previews(authors),
+                    to_attr="recipes_preview",
+                ),
+            )
+        serializer = self.get_serializer(authors, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 class SubscribeViewSet(viewsets.ModelViewSet):
@@ -39,17 +92,25 @@ class SubscribeViewSet(viewsets.ModelViewSet):
         serializer.save()
 
     def delete(self, request, user_id):
-        following_user = get_object_or_404(User, id=user_id)
-        follow = following_user.followings.filter(user_id=request.user.id)
-        if follow.exists():
-            follow.delete()
+        if remove_relation(
+            Follow, user_id=request.user.id, following_id=user_id
+        ):
             return Response(status=HTTPStatus.NO_CONTENT)
+        if not User.objects.filter(id=user_id).exists():
+            raise Http404
 
         return Response(
             {"errors": "Вы уже не подписаны."}, status=HTTPStatus.BAD_REQUEST
         )
 
 
+class BulkUnsubscribeView(BulkRelationView):
+    model = Follow
+    field = "following"
+    target_model = User
+    http_method_names = ["delete"]
+
+
 class UsersMeViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer